@@ -2,12 +2,14 @@
 Pydantic Schemas for API Request/Response validation
 """
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, Field
 
 class AnalyzeRequest(BaseModel):
     """Request schema for news analysis endpoint"""
     news_text: str = Field(..., min_length=10, max_length=5000, description="Arabic news text to analyze")
+    force_recompute: bool = Field(default=False, description="Re-run the analysis even if the same text was analyzed before")
+    async_explanation: bool = Field(default=False, description="Return the verdict immediately and generate the explanation in the background")
     
     class Config:
         json_schema_extra = {
@@ -42,10 +44,29 @@ class AnalysisResultResponse(BaseModel):
     analysis_id: int = Field(..., description="Unique analysis ID")
     is_fake: bool = Field(..., description="Whether news is classified as fake")
     credibility_score: int = Field(..., ge=0, le=100, description="Credibility score 0-100")
-    explanation: str = Field(..., description="Human-readable explanation")
+    explanation: Optional[str] = Field(None, description="Human-readable explanation (null while an async explanation is pending)")
+    explanation_status: str = Field(default="ready", description="Explanation state: pending, processing, ready or failed")
     prediction_details: PredictionResponse = Field(..., description="Detailed model predictions")
     explanation_data: Optional[ExplanationResponse] = Field(None, description="LLM explanation metadata")
     created_at: datetime = Field(..., description="Timestamp of analysis")
+    deduplicated: bool = Field(default=False, description="True when a stored analysis of the same text was returned")
+
+class BatchAnalyzeRequest(BaseModel):
+    """Request schema for bulk analysis"""
+    items: List[AnalyzeRequest] = Field(..., min_length=1, max_length=256, description="News items to analyze")
+
+class BatchItemResult(BaseModel):
+    """Outcome of one batch item: a result or an error, never both"""
+    index: int = Field(..., description="Position of the item in the request")
+    result: Optional[AnalysisResultResponse] = Field(None)
+    error: Optional[str] = Field(None, description="Why this item could not be analyzed")
+
+class BatchAnalyzeResponse(BaseModel):
+    """Bulk analysis response, one entry per request item in input order"""
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
 
 class HealthResponse(BaseModel):
     """Health check response"""
@@ -55,6 +76,12 @@ class HealthResponse(BaseModel):
     llm_available: bool = Field(...)
     version: str = Field(default="1.0.0")
 
+class ReadinessResponse(BaseModel):
+    """Readiness probe response"""
+    ready: bool
+    error: Optional[str] = None
+    phases_ms: Dict[str, float] = Field(default_factory=dict, description="Startup phase durations")
+
 class AnalysisHistoryResponse(BaseModel):
     """Single history item"""
     analysis_id: int
@@ -66,8 +93,10 @@ class AnalysisHistoryResponse(BaseModel):
 class HistoryResponse(BaseModel):
     """Paginated history response"""
     total: int
+    total_is_exact: bool = Field(default=False, description="False when total comes from the stats rollups")
     limit: int
     offset: int
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page; null on the last page")
     items: List[AnalysisHistoryResponse]
 
 class StatsResponse(BaseModel):
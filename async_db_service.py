@@ -0,0 +1,307 @@
+"""
+Async Database Service: the DatabaseService CRUD surface on SQLAlchemy AsyncSession (aiosqlite / asyncpg)
+"""
+import logging
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import db_queries as queries
+from db_engine import EngineConfig
+from database_models import Analysis, Prediction, ExplanationData, DailyStats, HourlyStats
+
+load_dotenv()
+logger = logging.getLogger("async_db_service")
+
+
+class AsyncDatabaseService:
+    """
+    Non-blocking counterpart of DatabaseService for use directly in async handlers.
+
+    Statements come from db_queries, shared with the sync service, so both paths
+    return identical results. Schema creation and migrations stay with
+    DatabaseService, which is constructed first at startup. Background jobs
+    (explanation queue, maintenance) keep using the sync service on the DB pool.
+    """
+
+    def __init__(self, database_url: str = None):
+        if database_url is None:
+            database_url = os.getenv("DATABASE_URL", "sqlite:///./mesdaq_ai.db")
+
+        self.database_url = database_url
+
+        # Handle Render's postgres:// vs sqlalchemy's postgresql://
+        if self.database_url.startswith("postgres://"):
+            self.database_url = self.database_url.replace("postgres://", "postgresql://", 1)
+
+        self.engine = EngineConfig.from_env().create_async_engine(self.database_url)
+        # Objects stay readable after commit without an implicit (sync) refresh
+        self.SessionLocal = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+        logger.info("Async database service initialized")
+
+    def get_session(self) -> AsyncSession:
+        """Get an async database session"""
+        return self.SessionLocal()
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+    async def create_analysis(
+        self,
+        news_text: str,
+        is_fake: bool,
+        credibility_score: int,
+        explanation: str,
+        user_ip: str = None,
+        content_hash: str = None,
+        explanation_status: str = "ready",
+        session: AsyncSession = None
+    ) -> Analysis:
+        """Create a new analysis record"""
+        return await self._add(
+            Analysis(
+                news_text=news_text,
+                content_hash=content_hash,
+                is_fake=is_fake,
+                credibility_score=credibility_score,
+                explanation=explanation,
+                explanation_status=explanation_status,
+                user_ip=user_ip
+            ),
+            "analysis",
+            session
+        )
+
+    async def create_prediction(
+        self,
+        analysis_id: int,
+        model_confidence: float,
+        logits_fake: float,
+        logits_real: float,
+        sentiment: str,
+        is_clickbait: bool,
+        clickbait_keywords: str = None,
+        entity_person_count: int = 0,
+        entity_org_count: int = 0,
+        entity_loc_count: int = 0,
+        word_count: int = 0,
+        session: AsyncSession = None
+    ) -> Prediction:
+        """Create prediction record"""
+        return await self._add(
+            Prediction(
+                analysis_id=analysis_id,
+                model_confidence=model_confidence,
+                logits_fake=logits_fake,
+                logits_real=logits_real,
+                sentiment=sentiment,
+                is_clickbait=is_clickbait,
+                clickbait_keywords=clickbait_keywords,
+                entity_person_count=entity_person_count,
+                entity_org_count=entity_org_count,
+                entity_loc_count=entity_loc_count,
+                word_count=word_count
+            ),
+            "prediction",
+            session
+        )
+
+    async def create_explanation(
+        self,
+        analysis_id: int,
+        llm_model: str,
+        llm_provider: str,
+        raw_explanation: str,
+        prompt_tokens: int = None,
+        completion_tokens: int = None,
+        cache_key: str = None,
+        session: AsyncSession = None
+    ) -> ExplanationData:
+        """Create explanation record"""
+        return await self._add(
+            ExplanationData(
+                analysis_id=analysis_id,
+                llm_model=llm_model,
+                llm_provider=llm_provider,
+                raw_explanation=raw_explanation,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                cache_key=cache_key
+            ),
+            "explanation",
+            session
+        )
+
+    async def _add(self, instance, kind: str, session: Optional[AsyncSession]):
+        if session is None:
+            async with self.get_session() as own_session:
+                return await self._add(instance, kind, own_session)
+
+        try:
+            session.add(instance)
+            await session.commit()
+            return instance
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Failed to create {kind}: {str(e)}")
+            raise
+
+    async def save_analysis(self, record: dict, session: AsyncSession = None) -> tuple:
+        """
+        Persist one analysis, its prediction and (optionally) explanation plus the
+        rollup updates as a single unit of work. Returns (analysis_id, created_at).
+        """
+        return (await self.create_analyses_bulk([record], session=session))[0]
+
+    async def create_analyses_bulk(self, records: list, update_stats: bool = True, session: AsyncSession = None) -> list:
+        """
+        Insert analyses with their prediction and explanation rows in one transaction,
+        incrementing the daily/hourly rollups in the same transaction.
+        Returns (analysis_id, created_at) per record, in input order.
+        """
+        if session is None:
+            async with self.get_session() as own_session:
+                return await self.create_analyses_bulk(records, update_stats, own_session)
+
+        try:
+            analyses = queries.build_analyses(records)
+            session.add_all(analyses)
+            await session.flush()
+            saved = [(analysis.id, analysis.created_at) for analysis in analyses]
+            if update_stats:
+                for statements in queries.rollup_increments(self.engine.dialect.name, analyses):
+                    await self._execute_upsert(session, statements)
+            await session.commit()
+            if len(saved) == 1:
+                logger.info(f"Analysis created: ID {saved[0][0]}")
+            else:
+                logger.info(f"Bulk created {len(saved)} analyses")
+            return saved
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Failed to save analyses: {str(e)}")
+            raise
+
+    async def get_cached_explanation(
+        self,
+        cache_key: str,
+        max_age_seconds: Optional[int] = None,
+        session: AsyncSession = None
+    ) -> Optional[ExplanationData]:
+        """Most recent generated explanation stored under a cache key"""
+        return await self._first(queries.cached_explanation(cache_key, max_age_seconds), session)
+
+    async def get_analysis_by_id(self, analysis_id: int, session: AsyncSession = None) -> Optional[Analysis]:
+        """Get analysis by ID with all related data"""
+        return await self._first(queries.analysis_by_id(analysis_id), session)
+
+    async def get_analysis_by_content_hash(self, content_hash: str, session: AsyncSession = None) -> Optional[Analysis]:
+        """Most recent complete analysis of the same normalized text, with related rows loaded"""
+        return await self._first(queries.latest_analysis_by_content_hash(content_hash), session)
+
+    async def get_analyses_by_content_hashes(self, content_hashes: list, session: AsyncSession = None) -> dict:
+        """Most recent complete analysis per normalized-text hash, in one query"""
+        if session is None:
+            async with self.get_session() as own_session:
+                return await self.get_analyses_by_content_hashes(content_hashes, own_session)
+
+        analyses = (await session.execute(queries.analyses_by_content_hashes(content_hashes))).scalars().all()
+        return {analysis.content_hash: analysis for analysis in analyses}
+
+    async def _first(self, statement, session: Optional[AsyncSession]):
+        if session is None:
+            async with self.get_session() as own_session:
+                return await self._first(statement, own_session)
+        return (await session.execute(statement)).scalars().first()
+
+    async def get_analyses_paginated(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        exact_total: bool = False,
+        preview_chars: int = 100,
+        session: AsyncSession = None
+    ) -> tuple:
+        """Keyset-paginated history; see DatabaseService.get_analyses_paginated"""
+        if session is None:
+            async with self.get_session() as own_session:
+                return await self.get_analyses_paginated(limit, offset, cursor, exact_total, preview_chars, own_session)
+
+        rows = (await session.execute(queries.history_page(limit, offset, cursor, preview_chars))).all()
+        rows, next_cursor = queries.split_page(rows, limit)
+        total = (await session.execute(queries.history_total(exact_total))).scalar() or 0
+        return rows, int(total), next_cursor
+
+    async def get_statistics(self, session: AsyncSession = None) -> dict:
+        """Overall statistics from the daily/hourly rollups"""
+        if session is None:
+            async with self.get_session() as own_session:
+                return await self.get_statistics(own_session)
+
+        return queries.statistics_result(
+            (await session.execute(queries.rollup_totals())).one(),
+            (await session.execute(queries.last_24h_total())).scalar(),
+            (await session.execute(queries.last_analysis_time())).scalar()
+        )
+
+    async def ping(self) -> bool:
+        """Cheap connectivity probe for health checks"""
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+
+    async def update_daily_stats(self, session: AsyncSession = None):
+        """Recount today's statistics from `analyses` (see reconcile_stats)"""
+        await self.reconcile_stats(days=1, session=session)
+
+    async def reconcile_stats(self, days: int = 2, session: AsyncSession = None) -> int:
+        """Recompute recent DailyStats/HourlyStats from `analyses`; see DatabaseService.reconcile_stats"""
+        if session is None:
+            async with self.get_session() as own_session:
+                return await self.reconcile_stats(days, own_session)
+
+        try:
+            since = queries.reconcile_since(days)
+            dialect = self.engine.dialect.name
+            day_keys, hour_keys = queries.reconcile_keys(since)
+
+            # Lock the window's rollup rows before counting (see DatabaseService.reconcile_stats)
+            for key in day_keys:
+                await self._execute_upsert(session, queries.rollup_lock(dialect, DailyStats, DailyStats.date, key))
+            for key in hour_keys:
+                await self._execute_upsert(session, queries.rollup_lock(dialect, HourlyStats, HourlyStats.hour, key))
+
+            day_totals = queries.bucket_totals(
+                (await session.execute(queries.grouped_counts(func.date(Analysis.created_at), since))).all(), queries.day_start
+            )
+            hour_totals = queries.bucket_totals(
+                (await session.execute(queries.grouped_counts(queries.hour_bucket(dialect), since))).all(), queries.hour_start
+            )
+
+            days_written = sorted(set(day_keys) | set(day_totals))
+            for key in days_written:
+                await self._execute_upsert(session, queries.rollup_upsert(
+                    dialect, DailyStats, DailyStats.date, key, *day_totals.get(key, (0, 0, 0)), increment=False
+                ))
+            for key in sorted(set(hour_keys) | set(hour_totals)):
+                await self._execute_upsert(session, queries.rollup_upsert(
+                    dialect, HourlyStats, HourlyStats.hour, key, *hour_totals.get(key, (0, 0, 0)), increment=False
+                ))
+
+            await session.commit()
+            logger.info(f"Stats reconciled for {len(days_written)} day(s) since {since.date()}")
+            return len(days_written)
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Failed to reconcile stats: {str(e)}")
+            raise
+
+    @staticmethod
+    async def _execute_upsert(session: AsyncSession, statements: list):
+        result = await session.execute(statements[0])
+        if len(statements) > 1 and result.rowcount == 0:
+            await session.execute(statements[1])
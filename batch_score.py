@@ -0,0 +1,309 @@
+"""
+Offline bulk scoring: stream a JSONL/CSV corpus through the models without the HTTP server
+
+Usage:
+    python batch_score.py articles.jsonl -o scored.jsonl --workers 4 --no-llm
+    python batch_score.py feed.csv -o scored.jsonl --resume
+
+Input records are read lazily and at most `workers * 2` batches are in flight, so memory
+stays constant regardless of corpus size. Each worker process loads AraBERT once. Results
+are written in input order as JSON lines; the number of input records fully written is
+stored in a checkpoint file after every batch so an interrupted run can `--resume`.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+logger = logging.getLogger("batch_score")
+
+# Per-process state, set by _init_worker
+_worker = {}
+
+
+def read_records(path: str, input_format: str, text_field: str):
+    """
+    Yield (offset, record) pairs one at a time. Records that cannot be parsed are
+    yielded as {"_error": ...} so offsets stay aligned with the input.
+    """
+    handle = sys.stdin if path == "-" else open(path, "r", encoding="utf-8", newline="")
+    try:
+        if input_format == "csv":
+            for offset, row in enumerate(csv.DictReader(handle)):
+                yield offset, row
+            return
+
+        offset = 0
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    record = {text_field: record} if isinstance(record, str) else {"_error": "record is not an object"}
+            except json.JSONDecodeError as e:
+                record = {"_error": f"invalid JSON: {e}"}
+            yield offset, record
+            offset += 1
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def check_model_dir(model_dir: str):
+    """Fail fast in the parent: a worker whose initializer fails is respawned forever"""
+    if not os.path.isfile(os.path.join(model_dir, "config.json")):
+        raise SystemExit(f"Model directory {model_dir} has no config.json")
+    if not any(os.path.isfile(os.path.join(model_dir, name)) for name in ("model.safetensors", "pytorch_model.bin")):
+        raise SystemExit(f"Model directory {model_dir} has no model.safetensors or pytorch_model.bin")
+
+
+def _init_worker(model_dir: str, use_llm: bool, torch_threads: int):
+    """
+    Load the model once per worker process. A load error is kept and raised by
+    every batch (so the parent sees it) rather than crashing the initializer,
+    which the pool would retry endlessly.
+    """
+    try:
+        import torch
+        from feature_extractor import SentimentAnalyzer
+        from llm_service import LLMExplainer
+
+        if torch_threads > 0:
+            torch.set_num_threads(torch_threads)
+        _worker["analyzer"] = SentimentAnalyzer(model_dir=model_dir)
+        _worker["llm"] = LLMExplainer()
+        _worker["use_llm"] = use_llm and bool(_worker["llm"].api_key)
+    except Exception as e:
+        _worker["init_error"] = f"{type(e).__name__}: {e}"
+
+
+def _score_batch(batch, text_field: str, id_field: str, ner_batch_size: int):
+    """Score one batch of (offset, record) pairs; returns one output dict per pair"""
+    from feature_extractor import extract_features_batch
+
+    if "init_error" in _worker:
+        raise RuntimeError(f"Worker failed to load the model: {_worker['init_error']}")
+    analyzer = _worker["analyzer"]
+    llm = _worker["llm"]
+
+    outputs = [None] * len(batch)
+    valid = []
+    for position, (offset, record) in enumerate(batch):
+        base = {"offset": offset}
+        if id_field and id_field in record:
+            base["id"] = record[id_field]
+        text = record.get(text_field) if "_error" not in record else None
+        if not isinstance(text, str) or not text.strip():
+            base["error"] = record.get("_error") or f"missing '{text_field}'"
+            outputs[position] = base
+        else:
+            outputs[position] = base
+            valid.append((position, text))
+
+    if not valid:
+        return outputs
+
+    texts = [text for _, text in valid]
+    try:
+        inferences = analyzer.infer_batch(texts)
+        features_list = extract_features_batch(texts, inferences, ner_batch_size=ner_batch_size)
+    except Exception as e:
+        for position, _ in valid:
+            outputs[position]["error"] = f"inference failed: {e}"
+        return outputs
+
+    explanations = [None] * len(valid)
+    if _worker["use_llm"]:
+        explanations = asyncio.run(_explain_all(llm, texts, features_list))
+
+    for (position, text), features, explanation in zip(valid, features_list, explanations):
+        inference = features["inference"]
+        entities = features["ner_counts"]
+        clickbait = features["clickbait_analysis"]
+        outputs[position].update({
+            "is_fake": inference.is_fake,
+            "credibility_score": llm.calculate_credibility_score(
+                is_fake=inference.is_fake,
+                model_confidence=inference.model_confidence,
+                sentiment=inference.sentiment,
+                is_clickbait=clickbait["is_clickbait"],
+                entity_diversity=min(1.0, sum(entities.values()) / 10.0)
+            ),
+            "model_confidence": inference.model_confidence,
+            "logits_fake": inference.logits_fake,
+            "logits_real": inference.logits_real,
+            "sentiment": inference.sentiment,
+            "is_clickbait": clickbait["is_clickbait"],
+            "clickbait_keywords": clickbait["found_keywords"],
+            "entities": entities,
+            "word_count": features["total_words"]
+        })
+        if explanation is not None:
+            outputs[position]["explanation"] = explanation
+    return outputs
+
+
+async def _explain_all(llm, texts, features_list):
+    try:
+        results = await asyncio.gather(*(
+            llm.generate_explanation(
+                news_text=text,
+                is_fake=features["inference"].is_fake,
+                model_confidence=features["inference"].model_confidence,
+                sentiment=features["inference"].sentiment,
+                is_clickbait=features["clickbait_analysis"]["is_clickbait"],
+                entities=features["ner_counts"]
+            )
+            for text, features in zip(texts, features_list)
+        ))
+        return [explanation for explanation, _, _ in results]
+    finally:
+        # Each batch runs its own event loop; don't keep a client bound to a closed loop
+        await llm.aclose()
+
+
+def read_checkpoint(path: str) -> int:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("offset", 0))
+    except (FileNotFoundError, ValueError, json.JSONDecodeError):
+        return 0
+
+
+def write_checkpoint(path: str, offset: int):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"offset": offset, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSONL/CSV news corpus offline")
+    parser.add_argument("input", help="Input file (.jsonl or .csv), or - for JSONL on stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv"], default="auto", help="Input format")
+    parser.add_argument("--text-field", default="news_text", help="Field/column holding the article text")
+    parser.add_argument("--id-field", default="id", help="Field/column copied to the output as `id`")
+    parser.add_argument("--model-dir", default=os.path.dirname(os.path.abspath(__file__)), help="AraBERT model directory")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Worker processes")
+    parser.add_argument("--torch-threads", type=int, default=1, help="torch intra-op threads per worker (0 = torch default)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per forward pass")
+    parser.add_argument("--ner-batch-size", type=int, default=32, help="spaCy nlp.pipe batch size")
+    parser.add_argument("--no-llm", action="store_true", help="Skip LLM explanations")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.ckpt when writing to a file)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint offset, appending to the output")
+    parser.add_argument("--start-offset", type=int, default=0, help="Skip this many input records")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Progress report interval in seconds")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+
+    check_model_dir(args.model_dir)
+
+    input_format = args.format
+    if input_format == "auto":
+        input_format = "csv" if args.input.lower().endswith(".csv") else "jsonl"
+
+    checkpoint = args.checkpoint or (f"{args.output}.ckpt" if args.output != "-" else None)
+    start_offset = args.start_offset
+    if args.resume:
+        if checkpoint is None:
+            raise SystemExit("--resume needs --checkpoint when writing to stdout")
+        start_offset = max(start_offset, read_checkpoint(checkpoint))
+        logger.info(f"Resuming from offset {start_offset}")
+
+    if args.output == "-":
+        out = sys.stdout
+    else:
+        out = open(args.output, "a" if args.resume else "w", encoding="utf-8")
+
+    records = read_records(args.input, input_format, args.text_field)
+    if start_offset:
+        records = (item for item in records if item[0] >= start_offset)
+
+    ctx = multiprocessing.get_context("spawn")
+    pool = ctx.Pool(
+        processes=max(1, args.workers),
+        initializer=_init_worker,
+        initargs=(args.model_dir, not args.no_llm, args.torch_threads)
+    )
+
+    max_in_flight = max(1, args.workers) * 2
+    in_flight = deque()
+    done = scored = failed = 0
+    next_offset = start_offset
+    started = last_report = time.perf_counter()
+
+    def drain_one():
+        nonlocal done, scored, failed, next_offset, last_report
+        results = in_flight.popleft().get()
+        for item in results:
+            out.write(json.dumps(item, ensure_ascii=False) + "\n")
+            if "error" in item:
+                failed += 1
+            else:
+                scored += 1
+        out.flush()
+        done += len(results)
+        next_offset = results[-1]["offset"] + 1
+        if checkpoint:
+            write_checkpoint(checkpoint, next_offset)
+
+        now = time.perf_counter()
+        if now - last_report >= args.report_every:
+            logger.info(f"{done} docs ({scored} scored, {failed} failed), {done / (now - started):.1f} docs/sec")
+            last_report = now
+
+    try:
+        for batch in batched(records, max(1, args.batch_size)):
+            # Results are drained in submission order, keeping the output ordered
+            in_flight.append(pool.apply_async(_score_batch, (batch, args.text_field, args.id_field, args.ner_batch_size)))
+            while len(in_flight) >= max_in_flight:
+                drain_one()
+        while in_flight:
+            drain_one()
+        pool.close()
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted; resume with --resume (next offset {next_offset})")
+        pool.terminate()
+        raise SystemExit(130)
+    except BaseException:
+        # join() on a running pool raises ValueError and would mask the real error
+        logger.error(f"Aborted; resume with --resume (next offset {next_offset})")
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Finished: {done} docs ({scored} scored, {failed} failed) in {elapsed:.1f}s, "
+        f"{done / elapsed if elapsed else 0:.1f} docs/sec"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Clickbait keyword matching: one compiled, Arabic-normalizing pattern over the whole keyword list
+"""
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("clickbait")
+
+# Harakat, tanween, shadda, sukun, superscript alef and Quranic annotation marks
+ARABIC_MARKS = "\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06DC\u06DF-\u06E8\u06EA-\u06ED"
+TATWEEL = "\u0640"
+
+# Letter -> the forms it may take in text (hamza carriers, alef maqsura, taa marbuta)
+LETTER_VARIANTS = {
+    "\u0627": "\u0627\u0623\u0625\u0622\u0671",  # ا أ إ آ ٱ
+    "\u0648": "\u0648\u0624",  # و ؤ
+    "\u064A": "\u064A\u0649\u0626",  # ي ى ئ
+    "\u0647": "\u0647\u0629",  # ه ة
+}
+_CANONICAL = {variant: letter for letter, variants in LETTER_VARIANTS.items() for variant in variants}
+_MARKS_RE = re.compile(f"[{ARABIC_MARKS}{TATWEEL}]")
+_SPACE_RE = re.compile(r"\s+")
+
+DEFAULT_KEYWORDS = [
+    "شاهد قبل الحذف", "لن تصدق", "بسرعة", "فضيحة", "لا يفوتك",
+    "مفاجأة", "حصرياً", "عاجل", "الصدمة", "كيف حصل هذا", "خطير"
+]
+
+
+def normalize_keyword(text: str) -> str:
+    """Matching form: no marks or tatweel, canonical letters, single spaces"""
+    text = _MARKS_RE.sub("", text)
+    text = "".join(_CANONICAL.get(ch, ch) for ch in text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class KeywordMatcher:
+    """
+    Finds any of a set of keywords in a text in a single regex pass.
+
+    Keywords are normalized and merged into a trie, which is emitted as one
+    pattern: at each text position the engine only branches on distinct next
+    letters, so cost stays flat as the list grows into the thousands. Each letter
+    matches all its variant forms and may be followed by diacritics or tatweel,
+    and spaces match any whitespace run, so the pattern runs on the original text
+    and match offsets point into it directly. Longer keywords win over their
+    prefixes; matches do not overlap.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords: Dict[str, str] = {}
+        for keyword in keywords:
+            normalized = normalize_keyword(keyword)
+            if normalized:
+                self.keywords.setdefault(normalized, keyword)
+        self.pattern = re.compile(_trie_pattern(self.keywords)) if self.keywords else None
+
+    def find(self, text: str) -> List[dict]:
+        """[{"keyword", "start", "end", "text"}] in text order; `keyword` is the configured spelling"""
+        if self.pattern is None:
+            return []
+        return [
+            {
+                "keyword": self.keywords[normalize_keyword(match.group())],
+                "start": match.start(),
+                "end": match.end(),
+                "text": match.group()
+            }
+            for match in self.pattern.finditer(text)
+        ]
+
+
+def _trie_pattern(keywords) -> str:
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node: dict) -> str:
+    branches = [_char_pattern(ch) + _node_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    if "" in node:
+        # A keyword ends here; still try the longer ones first
+        return f"(?:{body})?" if len(branches) == 1 else f"{body}?"
+    return body
+
+
+def _char_pattern(ch: str) -> str:
+    if ch == " ":
+        return r"\s+"
+    variants = LETTER_VARIANTS.get(ch)
+    letter = f"[{variants}]" if variants else re.escape(ch)
+    if "\u0600" <= ch <= "\u06FF":
+        return f"{letter}[{ARABIC_MARKS}{TATWEEL}]*"
+    return letter
+
+
+class ClickbaitDetector:
+    """
+    Keyword-based clickbait detection.
+
+    Keywords come from `keywords_path` (one per line, `#` comments) when given,
+    else the built-in list. `reload()` re-reads the file when its mtime changed
+    and swaps in a new matcher; it is meant to run off the request path (the API
+    schedules it every CLICKBAIT_RELOAD_INTERVAL seconds), so `detect()` only
+    reads the current matcher. A failed reload keeps the previous list.
+    """
+
+    def __init__(self, keywords: Optional[List[str]] = None, keywords_path: Optional[str] = None):
+        self.keywords_path = keywords_path
+        self._default_keywords = list(keywords if keywords is not None else DEFAULT_KEYWORDS)
+        self._mtime = None
+        self._lock = threading.Lock()
+
+        self.matcher = KeywordMatcher(self._default_keywords)
+        if keywords_path:
+            self.reload()
+
+    @classmethod
+    def from_env(cls) -> "ClickbaitDetector":
+        return cls(keywords_path=os.getenv("CLICKBAIT_KEYWORDS_PATH") or None)
+
+    @property
+    def clickbait_keywords(self) -> List[str]:
+        return list(self.matcher.keywords.values())
+
+    def detect(self, text):
+        """
+        Clickbait keywords found in the text, with their positions.
+        """
+        matches = self.matcher.find(text)
+        found_keywords = list(dict.fromkeys(match["keyword"] for match in matches))
+        return {
+            "is_clickbait": len(found_keywords) > 0,
+            "found_keywords": found_keywords,
+            "matches": matches
+        }
+
+    def reload(self) -> bool:
+        """
+        Rebuild the matcher if the keyword file changed. Returns True when a new list was loaded.
+        """
+        if not self.keywords_path:
+            return False
+        with self._lock:
+            try:
+                mtime = os.stat(self.keywords_path).st_mtime
+                if mtime == self._mtime:
+                    return False
+                with open(self.keywords_path, "r", encoding="utf-8") as f:
+                    keywords = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+            except OSError as e:
+                logger.warning(f"Could not read clickbait keywords from {self.keywords_path}: {e}")
+                return False
+            started = time.perf_counter()
+            matcher = KeywordMatcher(keywords)
+            # Swapped in one assignment; concurrent detect() calls see the old or the new matcher
+            self.matcher = matcher
+            self._mtime = mtime
+            logger.info(
+                f"Loaded {len(matcher.keywords)} clickbait keywords from {self.keywords_path} "
+                f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            return True
+
+
+_shared_detector: Optional[ClickbaitDetector] = None
+_shared_lock = threading.Lock()
+
+
+def shared_detector() -> ClickbaitDetector:
+    """Process-wide detector built once from the environment"""
+    global _shared_detector
+    if _shared_detector is None:
+        with _shared_lock:
+            if _shared_detector is None:
+                _shared_detector = ClickbaitDetector.from_env()
+    return _shared_detector
@@ -2,7 +2,7 @@
 Database Models for Mesdaq AI
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Text, JSON, Index
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -15,9 +15,16 @@ class Analysis(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     news_text = Column(Text, nullable=False)
+    # SHA-256 of the normalized text (see feature_extractor.normalize_text), for dedup
+    content_hash = Column(String(64), nullable=True, index=True)
     is_fake = Column(Boolean, nullable=False)
     credibility_score = Column(Integer, nullable=False)  # 0-100
     explanation = Column(Text, nullable=True)  # Human-readable summary
+    # pending -> processing -> ready | failed (async explanation jobs); synchronous analyses are "ready"
+    explanation_status = Column(String(16), nullable=False, default="ready", server_default="ready", index=True)
+    explanation_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Lease start of the worker processing the job; stale leases are returned to pending
+    explanation_claimed_at = Column(DateTime, nullable=True)
     user_ip = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -25,6 +32,11 @@ class Analysis(Base):
     prediction = relationship("Prediction", back_populates="analysis", uselist=False, cascade="all, delete-orphan")
     explanation_data = relationship("ExplanationData", back_populates="analysis", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination for /history: ORDER BY created_at DESC, id DESC
+        Index("ix_analyses_created_at_id", "created_at", "id"),
+    )
+
 class Prediction(Base):
     """
     Detailed technical prediction data from the model
@@ -63,6 +75,9 @@ class ExplanationData(Base):
     raw_explanation = Column(Text, nullable=False)
     prompt_tokens = Column(Integer, nullable=True)
     completion_tokens = Column(Integer, nullable=True)
+    # Content-addressed key of the prompt inputs; set for every LLM explanation (fresh or
+    # a cache hit, which stores zero tokens) and NULL only for the local fallback text
+    cache_key = Column(String(64), nullable=True, index=True)
     
     analysis = relationship("Analysis", back_populates="explanation_data")
 
@@ -78,4 +93,29 @@ class DailyStats(Base):
     total_analyses = Column(Integer, default=0)
     fake_count = Column(Integer, default=0)
     real_count = Column(Integer, default=0)
+    # Running sum maintained by incremental upserts; avg_credibility_score = score_sum / total_analyses
+    score_sum = Column(Integer, nullable=False, default=0, server_default="0")
     avg_credibility_score = Column(Float, default=0.0)
+
+class HourlyStats(Base):
+    """
+    Hourly rollup backing the sliding 24h window in /stats
+    """
+    __tablename__ = "hourly_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hour = Column(DateTime, unique=True, nullable=False)  # start of the UTC hour
+    
+    total_analyses = Column(Integer, nullable=False, default=0)
+    fake_count = Column(Integer, nullable=False, default=0)
+    real_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+
+class IdAllocator(Base):
+    """
+    Primary key blocks handed out to the write-behind buffer (databases without sequences)
+    """
+    __tablename__ = "id_allocator"
+
+    name = Column(String(64), primary_key=True)  # table the ids are for
+    next_id = Column(Integer, nullable=False)
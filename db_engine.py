@@ -0,0 +1,189 @@
+"""
+Database engine construction: pool sizing, SQLite pragmas, PostgreSQL settings and pool metrics
+"""
+import logging
+import os
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from metrics import metrics
+
+logger = logging.getLogger("db_engine")
+
+checkout_wait_ms = metrics.histogram("db_pool_checkout_wait_ms", "Time spent waiting for a pooled DB connection")
+checkout_timeouts = metrics.counter("db_pool_timeouts_total", "Pool checkouts that timed out")
+checked_out = metrics.gauge("db_pool_checked_out", "DB connections currently checked out")
+saturation = metrics.gauge("db_pool_saturation", "Checked-out connections / (pool_size + max_overflow)")
+
+
+class _PoolInstrumentation:
+    """Records checkout wait time and how close the pool is to exhaustion"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            checkout_timeouts.inc()
+            raise
+        finally:
+            checkout_wait_ms.observe((time.perf_counter() - started) * 1000)
+        self._report()
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._report()
+
+    def _report(self):
+        in_use = self.checkedout()
+        capacity = self.size() + max(0, self._max_overflow)
+        checked_out.set(in_use)
+        saturation.set(round(in_use / capacity, 3) if capacity else 0)
+
+
+class InstrumentedQueuePool(_PoolInstrumentation, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_PoolInstrumentation, AsyncAdaptedQueuePool):
+    pass
+
+
+# SQLAlchemy names pool loggers after the class module; keep them at its default WARN level
+for _pool_class in (InstrumentedQueuePool, InstrumentedAsyncAdaptedQueuePool):
+    logging.getLogger(f"{__name__}.{_pool_class.__name__}").setLevel(logging.WARNING)
+
+
+# Async drivers used by AsyncDatabaseService for each sync URL scheme
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_database_url(database_url: str) -> str:
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://..."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+class EngineConfig:
+    """
+    Engine settings for the deployment's database.
+
+    SQLite: WAL journaling so readers don't block the writer, synchronous=NORMAL
+    (durable at checkpoints, far fewer fsyncs than FULL) and a busy timeout instead
+    of immediate "database is locked" errors.
+    PostgreSQL: explicit pool size / overflow, pre-ping to drop dead connections,
+    recycling before server-side idle timeouts, and a per-statement timeout.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = True,
+        statement_timeout_ms: int = 30000,
+        sqlite_journal_mode: str = "WAL",
+        sqlite_synchronous: str = "NORMAL",
+        sqlite_busy_timeout_ms: int = 5000
+    ):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pool_pre_ping = pool_pre_ping
+        self.statement_timeout_ms = statement_timeout_ms
+        self.sqlite_journal_mode = sqlite_journal_mode
+        self.sqlite_synchronous = sqlite_synchronous
+        self.sqlite_busy_timeout_ms = sqlite_busy_timeout_ms
+
+    @classmethod
+    def from_env(cls) -> "EngineConfig":
+        return cls(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+            statement_timeout_ms=int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000")),
+            sqlite_journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+            sqlite_synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            sqlite_busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        )
+
+    def engine_kwargs(self, database_url: str, is_async: bool = False) -> dict:
+        """Keyword arguments for create_engine / create_async_engine for this URL's dialect"""
+        url = make_url(database_url)
+        backend = url.get_backend_name()
+        poolclass = InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool
+
+        if backend == "sqlite":
+            if url.database in (None, "", ":memory:"):
+                # In-memory databases live in a single connection; keep SQLAlchemy's default pool
+                return {"connect_args": {"check_same_thread": False}}
+            return {
+                "poolclass": poolclass,
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "pool_timeout": self.pool_timeout,
+                "pool_pre_ping": self.pool_pre_ping,
+                "connect_args": {"check_same_thread": False, "timeout": self.sqlite_busy_timeout_ms / 1000}
+            }
+
+        kwargs = {
+            "poolclass": poolclass,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping
+        }
+        if backend == "postgresql" and self.statement_timeout_ms > 0:
+            if url.get_driver_name() == "asyncpg":
+                kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(self.statement_timeout_ms)}}
+            else:
+                kwargs["connect_args"] = {"options": f"-c statement_timeout={self.statement_timeout_ms}"}
+        return kwargs
+
+    def create_engine(self, database_url: str):
+        engine = create_engine(database_url, **self.engine_kwargs(database_url))
+        if engine.dialect.name == "sqlite":
+            self.install_sqlite_pragmas(engine)
+        logger.info(
+            f"DB engine: {engine.dialect.name}, pool={type(engine.pool).__name__}"
+            f" (size={self.pool_size}, overflow={self.max_overflow})"
+        )
+        return engine
+
+    def create_async_engine(self, database_url: str):
+        """AsyncEngine for the same database, using the async driver for its dialect"""
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        async_url = async_database_url(database_url)
+        engine = create_async_engine(async_url, **self.engine_kwargs(async_url, is_async=True))
+        if engine.dialect.name == "sqlite":
+            self.install_sqlite_pragmas(engine.sync_engine)
+        logger.info(f"Async DB engine: {engine.dialect.name}+{engine.dialect.driver}")
+        return engine
+
+    def install_sqlite_pragmas(self, engine):
+        """Apply journal mode, synchronous level and busy timeout to every new connection"""
+
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                if self.sqlite_journal_mode:
+                    cursor.execute(f"PRAGMA journal_mode={self.sqlite_journal_mode}")
+                if self.sqlite_synchronous:
+                    cursor.execute(f"PRAGMA synchronous={self.sqlite_synchronous}")
+                cursor.execute(f"PRAGMA busy_timeout={int(self.sqlite_busy_timeout_ms)}")
+            finally:
+                cursor.close()
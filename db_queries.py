@@ -0,0 +1,310 @@
+"""
+SQL statement builders shared by the sync (DatabaseService) and async (AsyncDatabaseService) services
+"""
+import base64
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, case, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload
+
+from database_models import Analysis, Prediction, ExplanationData, DailyStats, HourlyStats
+
+
+def analysis_with_children():
+    """Analyses with their prediction and explanation rows eagerly loaded"""
+    return select(Analysis).options(joinedload(Analysis.prediction), joinedload(Analysis.explanation_data))
+
+
+def analysis_by_id(analysis_id: int):
+    return analysis_with_children().where(Analysis.id == analysis_id)
+
+
+def latest_analysis_by_content_hash(content_hash: str):
+    """Most recent complete analysis (one with a prediction) of the same normalized text"""
+    return (
+        analysis_with_children()
+        .join(Prediction)
+        .where(Analysis.content_hash == content_hash)
+        .order_by(Analysis.created_at.desc(), Analysis.id.desc())
+        .limit(1)
+    )
+
+
+def analyses_by_content_hashes(content_hashes):
+    """Complete analyses for several hashes, oldest first (later rows win when keyed by hash)"""
+    return (
+        analysis_with_children()
+        .join(Prediction)
+        .where(Analysis.content_hash.in_(set(content_hashes)))
+        .order_by(Analysis.created_at, Analysis.id)
+    )
+
+
+def cached_explanation(cache_key: str, max_age_seconds: Optional[int] = None):
+    # Rows stored from a cache hit carry the key with zero tokens; prefer the original completion
+    stmt = select(ExplanationData).where(ExplanationData.cache_key == cache_key, ExplanationData.completion_tokens > 0)
+    if max_age_seconds:
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        stmt = stmt.join(Analysis).where(Analysis.created_at >= cutoff)
+    return stmt.order_by(ExplanationData.id.desc()).limit(1)
+
+
+def build_analyses(records: list) -> list:
+    """
+    ORM objects for create_analyses_bulk records: `analysis` and `prediction` column
+    values plus an optional `explanation`, attached through the relationships.
+    """
+    analyses = []
+    for record in records:
+        analysis = Analysis(**record["analysis"])
+        analysis.prediction = Prediction(**record["prediction"])
+        if record.get("explanation") is not None:
+            analysis.explanation_data = ExplanationData(**record["explanation"])
+        analyses.append(analysis)
+    return analyses
+
+
+# History (keyset pagination)
+
+def history_page(limit: int, offset: int = 0, cursor: Optional[str] = None, preview_chars: int = 100):
+    """
+    Newest-first page projecting a `preview_chars + 1` text prefix; fetches one extra
+    row so the caller can tell whether another page exists.
+    """
+    stmt = select(
+        Analysis.id,
+        func.substr(Analysis.news_text, 1, preview_chars + 1).label("news_text"),
+        Analysis.is_fake,
+        Analysis.credibility_score,
+        Analysis.created_at
+    ).order_by(Analysis.created_at.desc(), Analysis.id.desc())
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            Analysis.created_at < cursor_created_at,
+            and_(Analysis.created_at == cursor_created_at, Analysis.id < cursor_id)
+        ))
+    elif offset:
+        stmt = stmt.offset(offset)
+    return stmt.limit(limit + 1)
+
+
+def split_page(rows: list, limit: int) -> tuple:
+    """(rows, next_cursor) from a history_page result"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def history_total(exact: bool):
+    if exact:
+        return select(func.count(Analysis.id))
+    # Rollups outlive purged rows; only count days from the oldest retained analysis on
+    oldest_day = select(func.date(func.min(Analysis.created_at))).scalar_subquery()
+    return select(func.coalesce(func.sum(DailyStats.total_analyses), 0)).where(DailyStats.date >= oldest_day)
+
+
+def encode_cursor(created_at: datetime, analysis_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{analysis_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, analysis_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+# Statistics (rollups)
+
+def rollup_totals():
+    return select(
+        func.coalesce(func.sum(DailyStats.total_analyses), 0),
+        func.coalesce(func.sum(DailyStats.fake_count), 0),
+        # Days written before score_sum existed only carry the average
+        func.coalesce(func.sum(DailyStats.avg_credibility_score * DailyStats.total_analyses), 0)
+    )
+
+
+def last_24h_total():
+    """The current hour bucket plus the 23 before it"""
+    window_start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+    return select(func.coalesce(func.sum(HourlyStats.total_analyses), 0)).where(HourlyStats.hour >= window_start)
+
+
+def last_analysis_time():
+    """
+    created_at of the newest row, read from the end of ix_analyses_created_at_id.
+    Ids are not in time order: write-behind workers each take preallocated id blocks.
+    """
+    return select(Analysis.created_at).order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(1)
+
+
+def statistics_result(totals, last_24h, last_time) -> dict:
+    total_analyses, fake_count, weighted_score = totals
+    real_count = total_analyses - fake_count
+    avg_score = weighted_score / total_analyses if total_analyses else 0
+    return {
+        "total_analyses": int(total_analyses),
+        "fake_count": int(fake_count),
+        "real_count": int(real_count),
+        "avg_credibility_score": round(float(avg_score), 2),
+        "fake_percentage": round((fake_count / total_analyses * 100), 2) if total_analyses > 0 else 0,
+        "last_24h_analyses": int(last_24h or 0),
+        "last_analysis_time": last_time
+    }
+
+
+def reconcile_since(days: int) -> datetime:
+    today = datetime.utcnow().date()
+    return datetime.combine(today - timedelta(days=max(1, days) - 1), datetime.min.time())
+
+
+def hour_bucket(dialect_name: str):
+    """SQL expression truncating created_at to the hour"""
+    if dialect_name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:00:00", Analysis.created_at)
+    return func.date_trunc("hour", Analysis.created_at)
+
+
+def grouped_counts(bucket, since: datetime):
+    """(bucket, total, fake, score_sum) per bucket since `since`"""
+    return (
+        select(
+            bucket,
+            func.count(Analysis.id),
+            func.sum(case((Analysis.is_fake == True, 1), else_=0)),
+            func.sum(Analysis.credibility_score)
+        )
+        .where(Analysis.created_at >= since)
+        .group_by(bucket)
+    )
+
+
+def day_start(value) -> datetime:
+    """func.date() returns a string on SQLite and a date on PostgreSQL"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return datetime.combine(value, datetime.min.time())
+
+
+def hour_start(value) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def rollup_deltas(analyses: list) -> tuple:
+    """Per-day and per-hour [total, fake, score_sum] for freshly inserted analyses"""
+    per_day = defaultdict(lambda: [0, 0, 0])
+    per_hour = defaultdict(lambda: [0, 0, 0])
+    for analysis in analyses:
+        created_at = analysis.created_at
+        for counters in (
+            per_day[datetime.combine(created_at.date(), datetime.min.time())],
+            per_hour[created_at.replace(minute=0, second=0, microsecond=0)]
+        ):
+            counters[0] += 1
+            counters[1] += 1 if analysis.is_fake else 0
+            counters[2] += analysis.credibility_score
+    return per_day, per_hour
+
+
+def _rollup_values(model, key_column, key: datetime, total: int, fake: int, score_sum: int) -> dict:
+    values = {
+        key_column.key: key,
+        "total_analyses": total,
+        "fake_count": fake,
+        "real_count": total - fake,
+        "score_sum": score_sum
+    }
+    if hasattr(model, "avg_credibility_score"):
+        values["avg_credibility_score"] = score_sum / total if total else 0.0
+    return values
+
+
+def _upsert(dialect_name: str, model, key_column, key: datetime, values: dict, changes: dict) -> list:
+    if dialect_name in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+        return [
+            dialect_insert(model)
+            .values(**values)
+            .on_conflict_do_update(index_elements=[key_column], set_=changes)
+        ]
+    return [
+        update(model).where(key_column == key).values(**changes),
+        insert(model).values(**values)
+    ]
+
+
+def rollup_upsert(dialect_name: str, model, key_column, key: datetime, total: int, fake: int, score_sum: int, increment: bool) -> list:
+    """
+    Statements that add to (`increment`) or overwrite one rollup row.
+
+    SQLite/PostgreSQL get a single atomic INSERT ... ON CONFLICT (key) DO UPDATE.
+    Other dialects get [UPDATE, INSERT]; run the INSERT only if the UPDATE matched no row.
+    """
+    values = _rollup_values(model, key_column, key, total, fake, score_sum)
+    has_avg = "avg_credibility_score" in values
+
+    if increment:
+        new_total = func.coalesce(model.total_analyses, 0) + total
+        new_sum = func.coalesce(model.score_sum, 0) + score_sum
+        changes = {
+            "total_analyses": new_total,
+            "fake_count": func.coalesce(model.fake_count, 0) + fake,
+            "real_count": func.coalesce(model.real_count, 0) + (total - fake),
+            "score_sum": new_sum
+        }
+        if has_avg:
+            changes["avg_credibility_score"] = new_sum * 1.0 / new_total
+    else:
+        changes = {name: value for name, value in values.items() if name != key_column.key}
+
+    return _upsert(dialect_name, model, key_column, key, values, changes)
+
+
+def rollup_lock(dialect_name: str, model, key_column, key: datetime) -> list:
+    """
+    rollup_upsert-style statements that take the write lock on one rollup row
+    without changing it, creating it with zero counts if missing. Writers add to
+    the rollups in their insert transaction, so they wait on this lock.
+    """
+    values = _rollup_values(model, key_column, key, 0, 0, 0)
+    return _upsert(dialect_name, model, key_column, key, values, {"total_analyses": model.total_analyses})
+
+
+def reconcile_keys(since: datetime) -> tuple:
+    """Every day and hour bucket from `since` through the current hour"""
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    days, hours = [], []
+    day, hour = since, since
+    while day <= current_hour:
+        days.append(day)
+        day += timedelta(days=1)
+    while hour <= current_hour:
+        hours.append(hour)
+        hour += timedelta(hours=1)
+    return days, hours
+
+
+def bucket_totals(rows, to_key) -> dict:
+    """grouped_counts rows as {bucket start: (total, fake, score_sum)}"""
+    return {to_key(bucket): (total, fake or 0, score_sum or 0) for bucket, total, fake, score_sum in rows}
+
+
+def rollup_increments(dialect_name: str, analyses: list) -> list:
+    """rollup_upsert statement lists adding new analyses to the daily and hourly rollups"""
+    per_day, per_hour = rollup_deltas(analyses)
+    statements = []
+    for key, (total, fake, score_sum) in per_day.items():
+        statements.append(rollup_upsert(dialect_name, DailyStats, DailyStats.date, key, total, fake, score_sum, increment=True))
+    for key, (total, fake, score_sum) in per_hour.items():
+        statements.append(rollup_upsert(dialect_name, HourlyStats, HourlyStats.hour, key, total, fake, score_sum, increment=True))
+    return statements
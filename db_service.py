@@ -3,15 +3,54 @@ Database Service for CRUD operations and data persistence
 """
 import logging
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, func
+from typing import Optional
+from sqlalchemy import case, func, insert, inspect, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, Session
-from database_models import Base, Analysis, Prediction, ExplanationData, DailyStats
+import db_queries as queries
+from db_engine import EngineConfig
+from database_models import Base, Analysis, Prediction, ExplanationData, DailyStats, HourlyStats, IdAllocator
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 logger = logging.getLogger("db_service")
 
+def _holds_lease(analysis: Analysis, claimed_at: Optional[datetime]) -> bool:
+    """Whether an explanation job is still processing under the lease `claimed_at` (None skips the check)"""
+    if claimed_at is None:
+        return True
+    return analysis.explanation_status == "processing" and analysis.explanation_claimed_at == claimed_at
+
+def _store_explanation(
+    analysis: Analysis,
+    llm_model: str,
+    llm_provider: str,
+    raw_explanation: str,
+    prompt_tokens: Optional[int],
+    completion_tokens: Optional[int],
+    cache_key: Optional[str]
+):
+    """Set an analysis' explanation, keeping explanation_data in step with analyses.explanation"""
+    analysis.explanation = raw_explanation
+    if analysis.explanation_data is not None:
+        data = analysis.explanation_data
+        data.llm_model = llm_model
+        data.llm_provider = llm_provider
+        data.raw_explanation = raw_explanation
+        data.prompt_tokens = prompt_tokens
+        data.completion_tokens = completion_tokens
+        data.cache_key = cache_key
+    else:
+        analysis.explanation_data = ExplanationData(
+            llm_model=llm_model,
+            llm_provider=llm_provider,
+            raw_explanation=raw_explanation,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cache_key=cache_key
+        )
+
 class DatabaseService:
     """
     Handles all database operations with transaction management
@@ -27,19 +66,42 @@ class DatabaseService:
         if self.database_url.startswith("postgres://"):
             self.database_url = self.database_url.replace("postgres://", "postgresql://", 1)
 
-        connect_args = {"check_same_thread": False} if "sqlite" in self.database_url else {}
-        
-        self.engine = create_engine(
-            self.database_url,
-            connect_args=connect_args
-        )
+        # Pool sizing, SQLite WAL pragmas, PostgreSQL timeouts (see db_engine)
+        self.engine = EngineConfig.from_env().create_engine(self.database_url)
         
         # Create tables
         Base.metadata.create_all(bind=self.engine)
+        self._add_missing_columns()
         
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         logger.info(f"Database initialized: {database_url}")
     
+    def _add_missing_columns(self):
+        """
+        Lightweight forward migration: add nullable columns and indexes introduced
+        after a table was first created. create_all() never alters tables.
+        """
+        inspector = inspect(self.engine)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=self.engine.dialect)
+                default = ""
+                if column.server_default is not None:
+                    default = f" DEFAULT '{column.server_default.arg}'"
+                with self.engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}"))
+                logger.info(f"Added column {table.name}.{column.name}")
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=self.engine, checkfirst=True)
+                    logger.info(f"Created index {index.name}")
+    
     def get_session(self) -> Session:
         """Get a database session"""
         return self.SessionLocal()
@@ -51,6 +113,8 @@ class DatabaseService:
         credibility_score: int,
         explanation: str,
         user_ip: str = None,
+        content_hash: str = None,
+        explanation_status: str = "ready",
         session: Session = None
     ) -> Analysis:
         """Create a new analysis record"""
@@ -64,9 +128,11 @@ class DatabaseService:
         try:
             analysis = Analysis(
                 news_text=news_text,
+                content_hash=content_hash,
                 is_fake=is_fake,
                 credibility_score=credibility_score,
                 explanation=explanation,
+                explanation_status=explanation_status,
                 user_ip=user_ip
             )
             session.add(analysis)
@@ -139,6 +205,7 @@ class DatabaseService:
         raw_explanation: str,
         prompt_tokens: int = None,
         completion_tokens: int = None,
+        cache_key: str = None,
         session: Session = None
     ) -> ExplanationData:
         """Create explanation record"""
@@ -156,7 +223,8 @@ class DatabaseService:
                 llm_provider=llm_provider,
                 raw_explanation=raw_explanation,
                 prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens
+                completion_tokens=completion_tokens,
+                cache_key=cache_key
             )
             session.add(explanation)
             session.commit()
@@ -170,6 +238,26 @@ class DatabaseService:
             if close_session:
                 session.close()
     
+    def get_cached_explanation(
+        self,
+        cache_key: str,
+        max_age_seconds: Optional[int] = None,
+        session: Session = None
+    ) -> Optional[ExplanationData]:
+        """Most recent generated explanation stored under a cache key"""
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            return session.execute(queries.cached_explanation(cache_key, max_age_seconds)).scalars().first()
+        finally:
+            if close_session:
+                session.close()
+    
     def get_analysis_by_id(self, analysis_id: int, session: Session = None) -> Analysis:
         """Get analysis by ID with all related data"""
         
@@ -180,8 +268,460 @@ class DatabaseService:
             close_session = False
         
         try:
-            analysis = session.query(Analysis).filter(Analysis.id == analysis_id).first()
-            return analysis
+            return session.execute(queries.analysis_by_id(analysis_id)).scalars().first()
+        finally:
+            if close_session:
+                session.close()
+    
+    def get_analysis_by_content_hash(self, content_hash: str, session: Session = None) -> Optional[Analysis]:
+        """Most recent complete analysis of the same normalized text, with related rows loaded"""
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            return session.execute(queries.latest_analysis_by_content_hash(content_hash)).scalars().first()
+        finally:
+            if close_session:
+                session.close()
+    
+    def get_analyses_by_content_hashes(self, content_hashes: list, session: Session = None) -> dict:
+        """Most recent complete analysis per normalized-text hash, in one query"""
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            analyses = session.execute(queries.analyses_by_content_hashes(content_hashes)).scalars().all()
+            # Ascending order: later rows overwrite earlier ones, keeping the latest
+            return {analysis.content_hash: analysis for analysis in analyses}
+        finally:
+            if close_session:
+                session.close()
+    
+    def save_analysis(self, record: dict, session: Session = None) -> tuple:
+        """
+        Persist one analysis, its prediction and (optionally) explanation plus the
+        daily stats update as a single unit of work. See create_analyses_bulk.
+        Returns (analysis_id, created_at).
+        """
+        return self.create_analyses_bulk([record], session=session)[0]
+    
+    def create_analyses_bulk(self, records: list, update_stats: bool = True, session: Session = None) -> list:
+        """
+        Insert analyses with their prediction and explanation rows in one transaction.
+        
+        Each record is a dict with `analysis` and `prediction` column values and an
+        optional `explanation` (None for pending async explanations). Child rows are
+        attached through the relationships, so one flush inserts everything and one
+        commit ends the transaction; generated ids are read after the flush instead of
+        refreshing each row. With `update_stats` the daily stats are updated in the
+        same transaction (an O(1) increment per day and hour touched).
+        Returns (analysis_id, created_at) per record, in input order.
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            analyses = queries.build_analyses(records)
+            session.add_all(analyses)
+            session.flush()
+            # Read generated values before commit expires them (no per-row refresh)
+            saved = [(analysis.id, analysis.created_at) for analysis in analyses]
+            if update_stats:
+                for statements in queries.rollup_increments(self.engine.dialect.name, analyses):
+                    self._execute_upsert(session, statements)
+            session.commit()
+            if len(saved) == 1:
+                logger.info(f"Analysis created: ID {saved[0][0]}")
+            else:
+                logger.info(f"Bulk created {len(saved)} analyses")
+            return saved
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to save analyses: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def allocate_analysis_ids(self, count: int, session: Session = None) -> list:
+        """
+        Reserve `count` analysis ids for rows inserted later (write-behind).
+        PostgreSQL draws them from the table's own sequence; other databases use the
+        `id_allocator` table, which never hands out ids at or below MAX(analyses.id).
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            if self.engine.dialect.name == "postgresql":
+                ids = session.execute(
+                    text("SELECT nextval(pg_get_serial_sequence('analyses', 'id')) FROM generate_series(1, :count)"),
+                    {"count": count}
+                ).scalars().all()
+                session.commit()
+                return list(ids)
+            
+            floor = select(func.coalesce(func.max(Analysis.id), 0) + 1).scalar_subquery()
+            result = session.execute(
+                update(IdAllocator)
+                .where(IdAllocator.name == "analyses")
+                .values(next_id=case((IdAllocator.next_id > floor, IdAllocator.next_id), else_=floor) + count)
+            )
+            if result.rowcount == 0:
+                start = session.execute(select(floor)).scalar()
+                session.execute(insert(IdAllocator).values(name="analyses", next_id=start + count))
+            end = session.execute(select(IdAllocator.next_id).where(IdAllocator.name == "analyses")).scalar()
+            session.commit()
+            return list(range(end - count, end))
+        except IntegrityError:
+            # Another process created the allocator row first; its UPDATE path now applies
+            session.rollback()
+            return self.allocate_analysis_ids(count, session=session)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to allocate analysis ids: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def insert_analyses_bulk(self, records: list, update_stats: bool = True, session: Session = None) -> int:
+        """
+        Bulk INSERT (executemany) of records whose `analysis` values already carry
+        `id` and `created_at`, plus their child rows and rollups, in one transaction.
+        Records whose id is already stored are skipped, so replays are idempotent.
+        Returns the number of analyses inserted.
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            ids = [record["analysis"]["id"] for record in records]
+            existing = set(session.execute(select(Analysis.id).where(Analysis.id.in_(ids))).scalars().all())
+            records = [record for record in records if record["analysis"]["id"] not in existing]
+            if not records:
+                return 0
+            
+            session.execute(insert(Analysis), [record["analysis"] for record in records])
+            session.execute(
+                insert(Prediction),
+                [dict(record["prediction"], analysis_id=record["analysis"]["id"]) for record in records]
+            )
+            explanations = [
+                dict(record["explanation"], analysis_id=record["analysis"]["id"])
+                for record in records if record.get("explanation") is not None
+            ]
+            if explanations:
+                session.execute(insert(ExplanationData), explanations)
+            if update_stats:
+                # Transient objects only feed the rollup deltas
+                analyses = [Analysis(**record["analysis"]) for record in records]
+                for statements in queries.rollup_increments(self.engine.dialect.name, analyses):
+                    self._execute_upsert(session, statements)
+            session.commit()
+            logger.info(f"Bulk inserted {len(records)} analyses")
+            return len(records)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to bulk insert analyses: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def get_pending_explanation_ids(self, limit: int = 1000, session: Session = None) -> list:
+        """Ids of analyses whose explanation job has not been claimed yet, oldest first"""
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            rows = (
+                session.query(Analysis.id)
+                .filter(Analysis.explanation_status == "pending")
+                .order_by(Analysis.id)
+                .limit(limit)
+                .all()
+            )
+            return [row[0] for row in rows]
+        finally:
+            if close_session:
+                session.close()
+    
+    def reset_processing_explanations(self, lease_seconds: float, session: Session = None) -> int:
+        """
+        Return jobs whose `processing` lease is older than `lease_seconds` to
+        `pending` (their worker died). Jobs other live processes are working on
+        keep their fresh lease.
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            expired = datetime.utcnow() - timedelta(seconds=lease_seconds)
+            result = session.execute(
+                update(Analysis)
+                .where(
+                    Analysis.explanation_status == "processing",
+                    or_(Analysis.explanation_claimed_at.is_(None), Analysis.explanation_claimed_at < expired)
+                )
+                .values(explanation_status="pending", explanation_claimed_at=None)
+            )
+            session.commit()
+            return result.rowcount
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to reset explanation jobs: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def claim_explanation_job(self, analysis_id: int, session: Session = None) -> Optional[datetime]:
+        """
+        Atomically move a job from pending to processing and start its lease.
+        Returns the lease timestamp, which the worker passes back when completing
+        or failing the job, or None if another worker already claimed it.
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            claimed_at = datetime.utcnow()
+            result = session.execute(
+                update(Analysis)
+                .where(Analysis.id == analysis_id, Analysis.explanation_status == "pending")
+                .values(
+                    explanation_status="processing",
+                    explanation_attempts=Analysis.explanation_attempts + 1,
+                    explanation_claimed_at=claimed_at
+                )
+            )
+            session.commit()
+            return claimed_at if result.rowcount == 1 else None
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to claim explanation job {analysis_id}: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def complete_explanation(
+        self,
+        analysis_id: int,
+        llm_model: str,
+        llm_provider: str,
+        raw_explanation: str,
+        prompt_tokens: int = None,
+        completion_tokens: int = None,
+        cache_key: str = None,
+        claimed_at: Optional[datetime] = None,
+        session: Session = None
+    ) -> bool:
+        """
+        Store a generated explanation for an async job and mark it ready. With
+        `claimed_at`, nothing is written unless the job is still held under that
+        lease (it may have expired and been handed to another worker).
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            analysis = session.get(Analysis, analysis_id)
+            if analysis is None or not _holds_lease(analysis, claimed_at):
+                return False
+            _store_explanation(analysis, llm_model, llm_provider, raw_explanation, prompt_tokens, completion_tokens, cache_key)
+            analysis.explanation_status = "ready"
+            analysis.explanation_claimed_at = None
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to complete explanation {analysis_id}: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def fail_explanation_job(
+        self,
+        analysis_id: int,
+        max_attempts: int,
+        claimed_at: Optional[datetime] = None,
+        fallback: Optional[tuple] = None,
+        session: Session = None
+    ) -> Optional[str]:
+        """
+        Return a failed job to pending, or mark it failed once attempts are exhausted.
+        With `claimed_at`, a job no longer held under that lease is left alone.
+
+        `fallback` is an optional (llm_model, llm_provider, text) stored as the
+        explanation when the job is marked failed, so the row still has the local
+        fallback text to show. Returns the new status, or None if nothing changed.
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            analysis = session.get(Analysis, analysis_id)
+            if analysis is None or not _holds_lease(analysis, claimed_at):
+                return None
+            analysis.explanation_status = "failed" if analysis.explanation_attempts >= max_attempts else "pending"
+            analysis.explanation_claimed_at = None
+            if analysis.explanation_status == "failed" and fallback is not None:
+                llm_model, llm_provider, text = fallback
+                _store_explanation(analysis, llm_model, llm_provider, text, 0, 0, None)
+            session.commit()
+            return analysis.explanation_status
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to update explanation job {analysis_id}: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def release_explanation_job(self, analysis_id: int, claimed_at: datetime, session: Session = None) -> bool:
+        """
+        Hand a job this process holds back to `pending` without counting the
+        attempt (its worker was stopped, not failed). No-op if the lease was lost.
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            result = session.execute(
+                update(Analysis)
+                .where(
+                    Analysis.id == analysis_id,
+                    Analysis.explanation_status == "processing",
+                    Analysis.explanation_claimed_at == claimed_at
+                )
+                .values(
+                    explanation_status="pending",
+                    explanation_attempts=Analysis.explanation_attempts - 1,
+                    explanation_claimed_at=None
+                )
+            )
+            session.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to release explanation job {analysis_id}: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def requeue_explanation(self, analysis_id: int, session: Session = None) -> bool:
+        """
+        Turn a settled explanation (ready with the local fallback, or failed) back
+        into a fresh pending job. False if a job is already pending or running.
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            result = session.execute(
+                update(Analysis)
+                .where(Analysis.id == analysis_id, Analysis.explanation_status.in_(("ready", "failed")))
+                .values(explanation_status="pending", explanation_attempts=0, explanation_claimed_at=None)
+            )
+            session.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to requeue explanation {analysis_id}: {str(e)}")
+            raise
+        finally:
+            if close_session:
+                session.close()
+    
+    def attach_explanation(
+        self,
+        analysis_id: int,
+        llm_model: str,
+        llm_provider: str,
+        raw_explanation: str,
+        prompt_tokens: int = None,
+        completion_tokens: int = None,
+        cache_key: str = None,
+        session: Session = None
+    ) -> bool:
+        """
+        Replace the explanation of a stored analysis whose job is settled (e.g. a
+        duplicate request regenerated a fallback one). An LLM explanation (with a
+        `cache_key`) marks it ready; the fallback text keeps the current status.
+        Rows with a pending/processing job are left to the job.
+        """
+        
+        if session is None:
+            session = self.get_session()
+            close_session = True
+        else:
+            close_session = False
+        
+        try:
+            analysis = session.get(Analysis, analysis_id)
+            if analysis is None or analysis.explanation_status not in ("ready", "failed"):
+                return False
+            _store_explanation(analysis, llm_model, llm_provider, raw_explanation, prompt_tokens, completion_tokens, cache_key)
+            if cache_key is not None:
+                analysis.explanation_status = "ready"
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to attach explanation {analysis_id}: {str(e)}")
+            raise
         finally:
             if close_session:
                 session.close()
@@ -190,9 +730,21 @@ class DatabaseService:
         self,
         limit: int = 20,
         offset: int = 0,
+        cursor: Optional[str] = None,
+        exact_total: bool = False,
+        preview_chars: int = 100,
         session: Session = None
     ) -> tuple:
-        """Get paginated analyses"""
+        """
+        Newest-first page of analyses.
+        
+        With a `cursor` (the `next_cursor` of the previous page) this is a keyset seek
+        on (created_at, id) using ix_analyses_created_at_id, so deep pages cost the same
+        as the first one; `offset` is only applied without a cursor. Rows carry a
+        DB-side `preview_chars + 1` prefix of the text instead of the full article.
+        The total comes from the daily rollups unless `exact_total` asks for COUNT(*).
+        Returns (rows, total, next_cursor).
+        """
         
         if session is None:
             session = self.get_session()
@@ -201,15 +753,19 @@ class DatabaseService:
             close_session = False
         
         try:
-            total = session.query(func.count(Analysis.id)).scalar()
-            analyses = session.query(Analysis).order_by(Analysis.created_at.desc()).limit(limit).offset(offset).all()
-            return analyses, total
+            rows = session.execute(queries.history_page(limit, offset, cursor, preview_chars)).all()
+            rows, next_cursor = queries.split_page(rows, limit)
+            total = session.execute(queries.history_total(exact_total)).scalar() or 0
+            return rows, int(total), next_cursor
         finally:
             if close_session:
                 session.close()
     
     def get_statistics(self, session: Session = None) -> dict:
-        """Get overall statistics"""
+        """
+        Overall statistics from the daily/hourly rollups; cost does not grow with
+        the size of `analyses`.
+        """
         
         if session is None:
             session = self.get_session()
@@ -218,39 +774,36 @@ class DatabaseService:
             close_session = False
         
         try:
-            total_analyses = session.query(func.count(Analysis.id)).scalar() or 0
-            fake_count = session.query(func.count(Analysis.id)).filter(Analysis.is_fake == True).scalar() or 0
-            real_count = total_analyses - fake_count
-            
-            avg_score = session.query(func.avg(Analysis.credibility_score)).scalar() or 0
-            
-            # Last 24 hours
-            twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-            last_24h = session.query(func.count(Analysis.id)).filter(
-                Analysis.created_at >= twenty_four_hours_ago
-            ).scalar() or 0
-            
-            # Last analysis time
-            last_analysis = session.query(Analysis.created_at).order_by(
-                Analysis.created_at.desc()
-            ).first()
-            last_time = last_analysis[0] if last_analysis else None
-            
-            return {
-                "total_analyses": total_analyses,
-                "fake_count": fake_count,
-                "real_count": real_count,
-                "avg_credibility_score": round(float(avg_score), 2),
-                "fake_percentage": round((fake_count / total_analyses * 100), 2) if total_analyses > 0 else 0,
-                "last_24h_analyses": last_24h,
-                "last_analysis_time": last_time
-            }
+            return queries.statistics_result(
+                session.execute(queries.rollup_totals()).one(),
+                session.execute(queries.last_24h_total()).scalar(),
+                session.execute(queries.last_analysis_time()).scalar()
+            )
         finally:
             if close_session:
                 session.close()
     
+    def ping(self) -> bool:
+        """Cheap connectivity probe for health checks"""
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    
     def update_daily_stats(self, session: Session = None):
-        """Update daily statistics"""
+        """Recount today's statistics from `analyses` (see reconcile_stats)"""
+        self.reconcile_stats(days=1, session=session)
+    
+    def reconcile_stats(self, days: int = 2, session: Session = None) -> int:
+        """
+        Recompute the last `days` days of DailyStats and HourlyStats from `analyses`
+        with grouped queries and overwrite the incremental counters, correcting any
+        drift. Returns the number of days written.
+
+        The rollup rows of the window are write-locked before the recount (on SQLite
+        the first write takes the database lock), so inserts, which increment them in
+        the same transaction, either commit before the counts are read or wait for
+        this one; none of their increments is overwritten.
+        """
         
         if session is None:
             session = self.get_session()
@@ -259,48 +812,47 @@ class DatabaseService:
             close_session = False
         
         try:
-            today = datetime.utcnow().date()
+            since = queries.reconcile_since(days)
+            dialect = self.engine.dialect.name
+            day_keys, hour_keys = queries.reconcile_keys(since)
             
-            # Get or create today's stats
-            stats = session.query(DailyStats).filter(func.date(DailyStats.date) == today).first()
+            for key in day_keys:
+                self._execute_upsert(session, queries.rollup_lock(dialect, DailyStats, DailyStats.date, key))
+            for key in hour_keys:
+                self._execute_upsert(session, queries.rollup_lock(dialect, HourlyStats, HourlyStats.hour, key))
             
-            if not stats:
-                stats = DailyStats(date=datetime.combine(today, datetime.min.time()))
-                session.add(stats)
-            
-            # Recalculate today's stats
-            today_start = datetime.combine(today, datetime.min.time())
-            today_end = datetime.combine(today, datetime.max.time())
-            
-            total = session.query(func.count(Analysis.id)).filter(
-                Analysis.created_at >= today_start,
-                Analysis.created_at <= today_end
-            ).scalar() or 0
-            
-            fake = session.query(func.count(Analysis.id)).filter(
-                Analysis.created_at >= today_start,
-                Analysis.created_at <= today_end,
-                Analysis.is_fake == True
-            ).scalar() or 0
-            
-            real = total - fake
-            
-            avg_score = session.query(func.avg(Analysis.credibility_score)).filter(
-                Analysis.created_at >= today_start,
-                Analysis.created_at <= today_end
-            ).scalar() or 0
+            day_totals = queries.bucket_totals(
+                session.execute(queries.grouped_counts(func.date(Analysis.created_at), since)).all(), queries.day_start
+            )
+            hour_totals = queries.bucket_totals(
+                session.execute(queries.grouped_counts(queries.hour_bucket(dialect), since)).all(), queries.hour_start
+            )
             
-            stats.total_analyses = total
-            stats.fake_count = fake
-            stats.real_count = real
-            stats.avg_credibility_score = float(avg_score)
+            # Buckets without analyses are reset to zero
+            days_written = sorted(set(day_keys) | set(day_totals))
+            for key in days_written:
+                self._execute_upsert(session, queries.rollup_upsert(
+                    dialect, DailyStats, DailyStats.date, key, *day_totals.get(key, (0, 0, 0)), increment=False
+                ))
+            for key in sorted(set(hour_keys) | set(hour_totals)):
+                self._execute_upsert(session, queries.rollup_upsert(
+                    dialect, HourlyStats, HourlyStats.hour, key, *hour_totals.get(key, (0, 0, 0)), increment=False
+                ))
             
             session.commit()
-            logger.info(f"Daily stats updated: {total} analyses, {fake} fake, {real} real")
+            logger.info(f"Stats reconciled for {len(days_written)} day(s) since {since.date()}")
+            return len(days_written)
         except Exception as e:
             session.rollback()
-            logger.error(f"Failed to update daily stats: {str(e)}")
+            logger.error(f"Failed to reconcile stats: {str(e)}")
             raise
         finally:
             if close_session:
                 session.close()
+    
+    @staticmethod
+    def _execute_upsert(session: Session, statements: list):
+        """Run a queries.rollup_upsert statement list (INSERT only if the UPDATE missed)"""
+        result = session.execute(statements[0])
+        if len(statements) > 1 and result.rowcount == 0:
+            session.execute(statements[1])
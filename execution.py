@@ -0,0 +1,176 @@
+"""
+Execution model: bounded executors for blocking work and request admission control
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from metrics import metrics
+
+logger = logging.getLogger("execution")
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (honors affinity / cpuset limits where supported)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def threads_per_worker(workers: int) -> int:
+    """Even share of the CPUs for each of `workers` processes"""
+    return max(1, available_cpus() // max(1, workers))
+
+
+class ExecutorSaturated(Exception):
+    """
+    Raised when a pool or admission queue is full.
+    The API turns this into a 503 with a Retry-After header.
+    """
+
+    def __init__(self, name: str, retry_after: int = 1):
+        super().__init__(f"{name} is saturated, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a hard cap on running + queued tasks.
+
+    Blocking calls (torch, spaCy, SQLAlchemy) are submitted here so the event
+    loop stays responsive. Once `max_workers + max_queue` tasks are outstanding,
+    new submissions are rejected with ExecutorSaturated instead of piling up.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = 1):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+
+        self._in_flight = metrics.gauge(f"executor_{name}_in_flight", f"Tasks running or queued on the {name} pool")
+        self._rejected = metrics.counter(f"executor_{name}_rejected_total", f"Tasks rejected by the {name} pool")
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Underlying thread pool, (re)created on first use after a shutdown"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking callable on the pool and await its result"""
+        if not self._slots.acquire(blocking=False):
+            self._rejected.inc()
+            raise ExecutorSaturated(self.name, self.retry_after)
+
+        self._in_flight.inc()
+        try:
+            future = self.executor.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        # Release on completion of the task itself, not of the awaiting coroutine,
+        # so a cancelled request does not free a slot its thread still occupies.
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self._in_flight.dec()
+        self._slots.release()
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+class AdmissionController:
+    """
+    Caps the number of requests of one kind processed concurrently.
+    Used as a context manager around a handler body; rejects instead of queueing.
+    """
+
+    def __init__(self, name: str, max_in_flight: int, retry_after: int = 1):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.retry_after = retry_after
+        self._current = 0
+        self._lock = threading.Lock()
+
+        self._in_flight = metrics.gauge(f"admission_{name}_in_flight", f"{name} requests being processed")
+        self._rejected = metrics.counter(f"admission_{name}_rejected_total", f"{name} requests rejected with 503")
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free; never blocks"""
+        with self._lock:
+            if self._current >= self.max_in_flight:
+                self._rejected.inc()
+                return False
+            self._current += 1
+        self._in_flight.inc()
+        return True
+
+    def release(self):
+        with self._lock:
+            self._current -= 1
+        self._in_flight.dec()
+
+    def __enter__(self):
+        if not self.try_acquire():
+            raise ExecutorSaturated(self.name, self.retry_after)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class ExecutionPools:
+    """
+    Dedicated pools for CPU inference, feature extraction (NER, clickbait) and
+    database I/O. Features get their own pool so they run alongside the forward pass.
+    Outbound LLM I/O is natively async (see llm_client) and needs no thread pool.
+    """
+
+    def __init__(
+        self,
+        inference_workers: int = 2,
+        inference_queue: int = 64,
+        feature_workers: int = 2,
+        feature_queue: int = 64,
+        db_workers: int = 4,
+        db_queue: int = 64,
+        retry_after: int = 2
+    ):
+        self.inference = BoundedExecutor("inference", inference_workers, inference_queue, retry_after)
+        self.features = BoundedExecutor("features", feature_workers, feature_queue, retry_after)
+        self.db = BoundedExecutor("db", db_workers, db_queue, retry_after)
+        logger.info(
+            f"Execution pools: inference={inference_workers}/{inference_queue}, "
+            f"features={feature_workers}/{feature_queue}, "
+            f"db={db_workers}/{db_queue} (workers/queue)"
+        )
+
+    @classmethod
+    def from_env(cls) -> "ExecutionPools":
+        return cls(
+            inference_workers=int(os.getenv("INFERENCE_WORKERS", "2")),
+            inference_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "64")),
+            feature_workers=int(os.getenv("FEATURE_WORKERS", "2")),
+            feature_queue=int(os.getenv("FEATURE_QUEUE_SIZE", "64")),
+            db_workers=int(os.getenv("DB_WORKERS", "4")),
+            db_queue=int(os.getenv("DB_QUEUE_SIZE", "64")),
+            retry_after=int(os.getenv("RETRY_AFTER_SECONDS", "2"))
+        )
+
+    def shutdown(self, wait: bool = True):
+        for pool in (self.inference, self.features, self.db):
+            pool.shutdown(wait=wait)
@@ -0,0 +1,168 @@
+"""
+Content-addressed cache for LLM explanations of repeated news texts
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import NamedTuple, Optional, Tuple
+
+from feature_extractor import content_hash
+from metrics import metrics
+
+logger = logging.getLogger("explanation_cache")
+
+memory_hits = metrics.counter("explanation_cache_memory_hits_total", "Explanations served from the in-process LRU")
+db_hits = metrics.counter("explanation_cache_db_hits_total", "Explanations served from the explanation_data table")
+misses = metrics.counter("explanation_cache_misses_total", "Explanation lookups that required an LLM call")
+prompt_tokens_saved = metrics.counter("explanation_cache_prompt_tokens_saved_total", "Prompt tokens not spent thanks to the cache")
+completion_tokens_saved = metrics.counter(
+    "explanation_cache_completion_tokens_saved_total", "Completion tokens not spent thanks to the cache"
+)
+
+
+class CachedExplanation(NamedTuple):
+    explanation: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class ExplanationCache:
+    """
+    Two-tier cache of generated explanations.
+
+    Keys combine the normalized-text hash with the classification inputs that
+    LLMExplainer._build_prompt sees, so a hit is an explanation generated for the
+    same prompt. Tier 1 is an in-process LRU with TTL; tier 2 (optional) looks up
+    previously generated rows in `explanation_data` by their `cache_key`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: int = 86400,
+        confidence_bucket_pct: int = 5,
+        db_service=None,
+        db_executor=None
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.confidence_bucket_pct = max(1, confidence_bucket_pct)
+        self.db_service = db_service
+        self.db_executor = db_executor
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, db_service=None, db_executor=None) -> "ExplanationCache":
+        persistent = os.getenv("EXPLANATION_CACHE_PERSISTENT", "true").lower() == "true"
+        return cls(
+            max_entries=int(os.getenv("EXPLANATION_CACHE_SIZE", "1024")),
+            ttl_seconds=int(os.getenv("EXPLANATION_CACHE_TTL", "86400")),
+            confidence_bucket_pct=int(os.getenv("EXPLANATION_CACHE_CONFIDENCE_BUCKET", "5")),
+            db_service=db_service if persistent else None,
+            db_executor=db_executor
+        )
+
+    def make_key(
+        self,
+        news_text: str,
+        is_fake: bool,
+        model_confidence: float,
+        sentiment: str,
+        is_clickbait: bool,
+        entities: dict
+    ) -> str:
+        """Cache key over the normalized text and the prompt's classification inputs"""
+        confidence_pct = min(99, round(model_confidence * 100))
+        bucket = confidence_pct - confidence_pct % self.confidence_bucket_pct
+        parts = [
+            content_hash(news_text),
+            "fake" if is_fake else "real",
+            str(bucket),
+            sentiment,
+            "clickbait" if is_clickbait else "plain",
+            str(sum(entities.values()))
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[CachedExplanation]:
+        """Look up the memory tier, then the persistent tier"""
+        cached = self._get_memory(key)
+        if cached is not None:
+            memory_hits.inc()
+            self._count_saved(cached)
+            return cached
+
+        if self.db_service is not None and self.db_executor is not None:
+            try:
+                row = await self.db_executor.run(self.db_service.get_cached_explanation, key, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Persistent explanation cache lookup failed: {e}")
+                row = None
+            if row is not None:
+                cached = CachedExplanation(row.raw_explanation, row.prompt_tokens or 0, row.completion_tokens or 0)
+                self.put(key, cached)
+                db_hits.inc()
+                self._count_saved(cached)
+                return cached
+
+        misses.inc()
+        return None
+
+    async def get_or_generate(
+        self,
+        llm_service,
+        news_text: str,
+        admission=None,
+        **prompt_inputs
+    ) -> Tuple[str, int, int, Optional[str]]:
+        """
+        Serve the explanation from cache or generate it with the LLM.
+
+        Returns (explanation, prompt_tokens, completion_tokens, cache_key). Tokens are
+        zero on a hit since nothing was spent; cache_key is set whenever the text came
+        from the LLM (fresh or cached) and None for the local fallback. It is stored in
+        `explanation_data.cache_key`, which marks the explanation as a real one.
+        """
+        key = self.make_key(news_text, **prompt_inputs)
+        cached = await self.get(key)
+        if cached is not None:
+            return cached.explanation, 0, 0, key
+
+        with admission or nullcontext():
+            explanation, p_tokens, c_tokens = await llm_service.generate_explanation(news_text=news_text, **prompt_inputs)
+
+        # Only cache real LLM completions, not the local fallback text
+        if p_tokens or c_tokens:
+            self.put(key, CachedExplanation(explanation, p_tokens, c_tokens))
+            return explanation, p_tokens, c_tokens, key
+        return explanation, p_tokens, c_tokens, None
+
+    def put(self, key: str, value: CachedExplanation):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_memory(self, key: str) -> Optional[CachedExplanation]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    @staticmethod
+    def _count_saved(cached: CachedExplanation):
+        prompt_tokens_saved.inc(cached.prompt_tokens)
+        completion_tokens_saved.inc(cached.completion_tokens)
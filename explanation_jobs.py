@@ -0,0 +1,221 @@
+"""
+Background explanation jobs: durable queue state in `analyses`, drained by async workers
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from metrics import metrics
+
+logger = logging.getLogger("explanation_jobs")
+
+queue_depth = metrics.gauge("explanation_jobs_queue_depth", "Explanation jobs waiting for a worker")
+completed_total = metrics.counter("explanation_jobs_completed_total", "Explanation jobs completed")
+failed_total = metrics.counter("explanation_jobs_failed_total", "Explanation job attempts that failed")
+job_latency_ms = metrics.histogram("explanation_jobs_latency_ms", "Time from claim to stored explanation")
+
+
+class ExplanationJobQueue:
+    """
+    Generates explanations outside the request path.
+
+    The source of truth is `analyses.explanation_status` (pending -> processing ->
+    ready | failed), so jobs survive restarts. Workers claim a job with an atomic
+    status update that also starts a lease (`explanation_claimed_at`); on start and
+    on every sweep, jobs whose lease is older than `lease_seconds` (their process
+    died) are returned to `pending`, while jobs other live workers/processes hold are
+    left alone. The sweep also re-enqueues pending rows that are not in the in-memory
+    queue (e.g. submitted while it was full). A worker whose lease expired and was
+    handed over does not write its result, and `stop()` releases the jobs this
+    process holds.
+
+    An LLM failure (the service answering with its local fallback text) counts as
+    a failed attempt: the job returns to `pending` for the next sweep, and after
+    `max_attempts` it is marked `failed` with the fallback text as its explanation.
+    Without an API key there is nothing to retry and jobs fail on the first attempt.
+    The number of workers bounds LLM concurrency for async explanations.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        llm_service,
+        explanation_cache,
+        db_executor,
+        workers: int = 4,
+        max_attempts: int = 3,
+        sweep_interval: float = 30.0,
+        max_queue: int = 1000,
+        lease_seconds: float = 300.0
+    ):
+        self.db_service = db_service
+        self.llm_service = llm_service
+        self.explanation_cache = explanation_cache
+        self.db_executor = db_executor
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.sweep_interval = sweep_interval
+        self.max_queue = max_queue
+        self.lease_seconds = lease_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[int] = set()
+        self._claims: Dict[int, datetime] = {}
+        self._tasks = []
+
+    @classmethod
+    def from_env(cls, db_service, llm_service, explanation_cache, db_executor) -> "ExplanationJobQueue":
+        return cls(
+            db_service,
+            llm_service,
+            explanation_cache,
+            db_executor,
+            workers=int(os.getenv("EXPLANATION_WORKERS", "4")),
+            max_attempts=int(os.getenv("EXPLANATION_MAX_ATTEMPTS", "3")),
+            sweep_interval=float(os.getenv("EXPLANATION_SWEEP_INTERVAL", "30")),
+            max_queue=int(os.getenv("EXPLANATION_QUEUE_SIZE", "1000")),
+            lease_seconds=float(os.getenv("EXPLANATION_LEASE_SECONDS", "300"))
+        )
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        await self._requeue_expired()
+
+        self._tasks = [asyncio.create_task(self._worker(), name=f"explanation-worker-{i}") for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper(), name="explanation-sweeper"))
+        logger.info(f"Explanation job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """
+        Stop workers and hand the jobs they were working on back to `pending`;
+        unfinished jobs stay in the DB and resume on the next start (here or in
+        another process) without waiting for their lease to expire
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._release_claims()
+        self._queued.clear()
+        queue_depth.set(0)
+
+    def enqueue(self, analysis_id: int):
+        """Schedule a pending job; if the queue is full the sweeper picks it up later"""
+        if self._queue is None or analysis_id in self._queued:
+            return
+        try:
+            self._queue.put_nowait(analysis_id)
+            self._queued.add(analysis_id)
+            queue_depth.set(self._queue.qsize())
+        except asyncio.QueueFull:
+            logger.warning(f"Explanation queue full, job {analysis_id} deferred to the next sweep")
+
+    async def _sweeper(self):
+        while True:
+            try:
+                await self._requeue_expired()
+                pending = await self.db_executor.run(self.db_service.get_pending_explanation_ids, self.max_queue)
+                for analysis_id in pending:
+                    self.enqueue(analysis_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Explanation job sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def _requeue_expired(self):
+        reset = await self.db_executor.run(self.db_service.reset_processing_explanations, self.lease_seconds)
+        if reset:
+            logger.info(f"Requeued {reset} explanation jobs whose lease expired")
+
+    async def _worker(self):
+        while True:
+            analysis_id = await self._queue.get()
+            self._queued.discard(analysis_id)
+            queue_depth.set(self._queue.qsize())
+            try:
+                await self._process(analysis_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Explanation job {analysis_id} crashed: {e}")
+
+    async def _process(self, analysis_id: int):
+        claimed_at = await self.db_executor.run(self.db_service.claim_explanation_job, analysis_id)
+        if claimed_at is None:
+            return  # already claimed or no longer pending
+        # Held until the job is settled; a cancelled job is released by stop()
+        self._claims[analysis_id] = claimed_at
+
+        started = time.perf_counter()
+        try:
+            analysis = await self.db_executor.run(self.db_service.get_analysis_by_id, analysis_id)
+            prediction = analysis.prediction
+            prompt_inputs = {
+                "is_fake": analysis.is_fake,
+                "model_confidence": prediction.model_confidence,
+                "sentiment": prediction.sentiment,
+                "is_clickbait": prediction.is_clickbait,
+                "entities": {
+                    "PER": prediction.entity_person_count or 0,
+                    "ORG": prediction.entity_org_count or 0,
+                    "LOC": prediction.entity_loc_count or 0
+                }
+            }
+
+            explanation, p_tokens, c_tokens, cache_key = await self.explanation_cache.get_or_generate(
+                self.llm_service, analysis.news_text, **prompt_inputs
+            )
+            if cache_key is None and not c_tokens:
+                # The LLM call failed and the service fell back to its local text
+                await self._fail(analysis_id, claimed_at, "the LLM returned no explanation", explanation)
+            else:
+                stored = await self.db_executor.run(
+                    self.db_service.complete_explanation,
+                    analysis_id,
+                    self.llm_service.model,
+                    "openrouter",
+                    explanation,
+                    p_tokens,
+                    c_tokens,
+                    cache_key,
+                    claimed_at
+                )
+                if stored:
+                    completed_total.inc()
+                    job_latency_ms.observe((time.perf_counter() - started) * 1000)
+                else:
+                    logger.warning(f"Explanation job {analysis_id} lost its lease; result discarded")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._fail(analysis_id, claimed_at, str(e))
+        self._claims.pop(analysis_id, None)
+
+    async def _fail(self, analysis_id: int, claimed_at, reason: str, fallback: Optional[str] = None):
+        failed_total.inc()
+        # Without an API key every attempt falls back, so there is nothing to retry
+        max_attempts = self.max_attempts if self.llm_service.api_key else 0
+        status = await self.db_executor.run(
+            self.db_service.fail_explanation_job,
+            analysis_id,
+            max_attempts,
+            claimed_at,
+            (self.llm_service.model, "openrouter", fallback) if fallback is not None else None
+        )
+        logger.error(f"Explanation job {analysis_id} failed ({reason}); now {status or 'held elsewhere'}")
+
+    async def _release_claims(self):
+        for analysis_id, claimed_at in list(self._claims.items()):
+            try:
+                await self.db_executor.run(self.db_service.release_explanation_job, analysis_id, claimed_at)
+            except Exception as e:
+                logger.warning(f"Could not release explanation job {analysis_id}; it resumes once its lease expires: {e}")
+        if self._claims:
+            logger.info(f"Released {len(self._claims)} in-progress explanation jobs")
+        self._claims.clear()
@@ -1,102 +1,254 @@
 import os
-import torch
-from transformers import BertTokenizer, BertForSequenceClassification
-# import spacy # Moved to NERCounter for better error handling on Python 3.14
+import re
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+# torch / transformers / spaCy are imported on first use so importing this module
+# (and the API) stays fast; the startup pipeline loads them in the background
+# import spacy # Moved to ner.NERCounter for better error handling on Python 3.14
 
 import logging
 
+from clickbait import ARABIC_MARKS, TATWEEL, ClickbaitDetector, shared_detector  # noqa: F401 (ClickbaitDetector re-exported)
+from inference_backends import TorchBackend, load_backend
+from metrics import metrics
+from ner import NERCounter, count_entities_batch, shared_counter  # noqa: F401 (NERCounter re-exported)
+
 # Configure logger
 logger = logging.getLogger(__name__)
 
+tokenize_ms = metrics.histogram("tokenize_ms", "Tokenization time per call (cache misses only)")
+encoding_cache_hits = metrics.counter("tokenizer_cache_hits_total", "Texts whose encoding came from the LRU cache")
+encoding_cache_misses = metrics.counter("tokenizer_cache_misses_total", "Texts that had to be tokenized")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_DIACRITICS_RE = re.compile(f"[{ARABIC_MARKS}]")
+_TATWEEL = TATWEEL
+# أ إ آ ٱ -> ا
+_ALEF_VARIANTS = str.maketrans({"\u0623": "\u0627", "\u0625": "\u0627", "\u0622": "\u0627", "\u0671": "\u0627"})
+
+def normalize_text(text):
+    """
+    Canonical form of a news text used for content addressing (caches, dedup).
+    Strips Arabic diacritics and tatweel, unifies alef variants,
+    collapses runs of whitespace and trims the ends.
+    """
+    text = _DIACRITICS_RE.sub("", text)
+    text = text.replace(_TATWEEL, "")
+    text = text.translate(_ALEF_VARIANTS)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def content_hash(text):
+    """
+    SHA-256 hex digest of the normalized text.
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def load_tokenizer(model_dir):
+    """
+    Rust-backed BertTokenizerFast from the tokenizer.json shipped with the model;
+    falls back to the pure-Python BertTokenizer (vocab.txt) if it cannot be loaded.
+    """
+    from transformers import BertTokenizer, BertTokenizerFast
+
+    try:
+        return BertTokenizerFast.from_pretrained(model_dir)
+    except Exception as e:
+        logger.warning(f"Fast tokenizer unavailable, using the Python BertTokenizer: {e}")
+        return BertTokenizer.from_pretrained(model_dir)
+
+class EncodingCache:
+    """
+    Thread-safe LRU of tokenizer outputs keyed by a digest of the exact input text
+    (not the normalized text: normalization changes the tokens).
+    """
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text):
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            encoding = self._entries.get(key)
+            if encoding is not None:
+                self._entries.move_to_end(key)
+            return encoding
+
+    def put(self, key, encoding):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = encoding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+class InferenceResult:
+    """
+    Output of one AraBERT forward pass over a single text.
+    Tokenization and inference happen once; every consumer reads from this object.
+    """
+    # Mapping depends on the model's training; assuming 0: Negative, 1: Positive for now.
+    # This can be adjusted based on the labels in config.json if available.
+    SENTIMENT_MAP = {0: "Negative", 1: "Positive", 2: "Neutral"}
+
+    def __init__(self, text, logits):
+        """
+        Args:
+            text (str): The analyzed text.
+            logits (torch.Tensor): 1-D logits row for this text.
+        """
+        import torch
+
+        self.text = text
+        probs = torch.softmax(logits, dim=0)
+
+        self.logits_fake = logits[0].item()
+        self.logits_real = logits[1].item()
+        self.fake_prob = probs[0].item()  # Assuming 0 is Fake/Negative
+        self.real_prob = probs[1].item()  # Assuming 1 is Real/Positive
+
+        self.is_fake = self.fake_prob > self.real_prob
+        self.model_confidence = self.fake_prob if self.is_fake else self.real_prob
+
+        prediction = torch.argmax(logits).item()
+        self.sentiment = self.SENTIMENT_MAP.get(prediction, "Unknown")
+
 class SentimentAnalyzer:
-    def __init__(self, model_dir=None, model=None, tokenizer=None):
+    MAX_LENGTH = 512
+
+    def __init__(self, model_dir=None, model=None, tokenizer=None, encoding_cache_size=None, backend=None):
         """
         Initialize the sentiment analyzer. 
-        Can accept pre-loaded model/tokenizer to prevent re-loading on every request.
+        Can accept pre-loaded model/tokenizer (or an inference backend, see
+        inference_backends) to prevent re-loading on every request. From a
+        `model_dir` the backend is chosen by INFERENCE_BACKEND.
+        Encodings of recently seen texts are kept in an LRU of `encoding_cache_size`
+        entries (TOKENIZER_CACHE_SIZE by default, 0 disables).
         """
-        if model and tokenizer:
+        if backend is None and model is not None:
+            backend = TorchBackend(model)
+        if backend and tokenizer:
             logger.info("Using pre-loaded AraBERT model...")
-            self.model = model
+            self.backend = backend
             self.tokenizer = tokenizer
         elif model_dir:
             logger.info(f"Loading AraBERT model from {model_dir}...")
-            self.tokenizer = BertTokenizer.from_pretrained(model_dir)
-            self.model = BertForSequenceClassification.from_pretrained(model_dir)
+            self.tokenizer = load_tokenizer(model_dir)
+            self.backend = load_backend(model_dir)
         else:
             raise ValueError("Must provide either model_dir or (model, tokenizer)")
             
-        self.model.eval()
+        # The torch module, for torch backends (None for ONNX Runtime)
+        self.model = getattr(self.backend, "model", None)
+        if encoding_cache_size is None:
+            encoding_cache_size = int(os.getenv("TOKENIZER_CACHE_SIZE", "2048"))
+        self.encoding_cache = EncodingCache(encoding_cache_size)
 
-    def analyze(self, text):
+    def infer(self, text):
         """
-        Predict sentiment for the given Arabic text.
+        Tokenize the text and run a single forward pass.
+        Returns an InferenceResult shared by classification, sentiment and persistence.
         """
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            # probability = torch.softmax(logits, dim=1) # Useful if we want confidence later
-            prediction = torch.argmax(logits, dim=1).item()
-        
-        # Mapping depends on the model's training; assuming 0: Negative, 1: Positive for now.
-        # This can be adjusted based on the labels in config.json if available.
-        sentiment_map = {0: "Negative", 1: "Positive", 2: "Neutral"}
-        return sentiment_map.get(prediction, "Unknown")
+        return self.infer_batch([text])[0]
 
-class ClickbaitDetector:
-    def __init__(self):
-        # Common Arabic clickbait keywords/phrases
-        self.clickbait_keywords = [
-            "شاهد قبل الحذف", "لن تصدق", "بسرعة", "فضيحة", "لا يفوتك", 
-            "مفاجأة", "حصرياً", "عاجل", "الصدمة", "كيف حصل هذا", "خطير"
-        ]
+    def encode(self, text):
+        """
+        Tokenize a single text without padding (used for length bucketing).
+        """
+        return self.encode_batch([text])[0]
 
-    def detect(self, text):
+    def encode_batch(self, texts):
         """
-        Simple keyword-based clickbait detection.
+        Tokenize several texts without padding, in one call to the tokenizer for
+        all cache misses. Returns {"input_ids", "token_type_ids", "attention_mask"}
+        lists per text; cached encodings are shared, so callers must not mutate them.
         """
-        found_keywords = [kw for kw in self.clickbait_keywords if kw in text]
-        is_clickbait = len(found_keywords) > 0
+        keys = [EncodingCache.key(text) for text in texts]
+        encodings = [self.encoding_cache.get(key) for key in keys]
+        missing = [i for i, encoding in enumerate(encodings) if encoding is None]
+        encoding_cache_hits.inc(len(texts) - len(missing))
+        if not missing:
+            return encodings
+
+        encoding_cache_misses.inc(len(missing))
+        started = time.perf_counter()
+        batch = self.tokenizer([texts[i] for i in missing], truncation=True, max_length=self.MAX_LENGTH)
+        tokenize_ms.observe((time.perf_counter() - started) * 1000)
+
+        for position, i in enumerate(missing):
+            encoding = {name: values[position] for name, values in batch.items()}
+            encodings[i] = encoding
+            self.encoding_cache.put(keys[i], encoding)
+        return encodings
+
+    def collate(self, encodings):
+        """Right-pad encodings into tensors (cheaper than tokenizer.pad on plain lists)"""
+        import torch
+
+        width = max(len(encoding["input_ids"]) for encoding in encodings)
+        pad_ids = {"input_ids": self.tokenizer.pad_token_id or 0, "token_type_ids": 0, "attention_mask": 0}
         return {
-            "is_clickbait": is_clickbait,
-            "found_keywords": found_keywords
+            name: torch.tensor([
+                encoding[name] + [pad_value] * (width - len(encoding[name])) for encoding in encodings
+            ])
+            for name, pad_value in pad_ids.items()
+            if name in encodings[0]
         }
 
-class NERCounter:
-    _nlp_instance = None
-    
-    def __init__(self):
+    def infer_encoded(self, texts, encodings):
         """
-        Initialize NER with singleton pattern for Spacy model
+        Run one padded forward pass over pre-tokenized texts.
+        Returns one InferenceResult per text, in input order.
         """
-        if NERCounter._nlp_instance is None:
-            try:
-                import spacy
-                NERCounter._nlp_instance = spacy.load("xx_ent_wiki_sm") # Multi-language model often used for Arabic
-            except (ImportError, Exception) as e:
-                logger.warning(f"Warning: Could not import or load spaCy. NER counting will be disabled. Error: {e}")
-                NERCounter._nlp_instance = None
-        
-        self.nlp = NERCounter._nlp_instance
+        logits = self.backend.forward(self.collate(list(encodings)))
+        return [InferenceResult(text, logits[i]) for i, text in enumerate(texts)]
 
-    def count_entities(self, text):
+    def infer_batch(self, texts):
         """
-        Count named entities (Person, Org, Loc) in the text.
+        Tokenize and classify several texts with a single padded forward pass.
         """
-        if not self.nlp:
-            return {"PER": 0, "ORG": 0, "LOC": 0}
-        
-        doc = self.nlp(text)
-        counts = {"PER": 0, "ORG": 0, "LOC": 0}
-        # Standard SpaCy labels: PER, ORG, LOC
-        for ent in doc.ents:
-            label = ent.label_
-            # Map standard labels if needed, but xx_ent_wiki_sm usually uses PER, ORG, LOC
-            if label in counts:
-                counts[label] += 1
-        return counts
-
-def extract_features(text, sentiment_analyzer=None, model_dir=None):
+        return self.infer_encoded(texts, self.encode_batch(texts))
+
+    def analyze(self, text):
+        """
+        Predict sentiment for the given Arabic text.
+        """
+        return self.infer(text).sentiment
+
+# Single-feature extractors, also used as feature_pipeline stages
+
+def detect_clickbait(text):
+    return shared_detector().detect(text)
+
+def count_entities(text):
+    return shared_counter().count_entities(text)
+
+def count_words(text):
+    return len(text.split())
+
+def assemble_features(text, inference, clickbait_analysis, ner_counts, total_words):
+    """
+    The features dict consumed by scoring, the LLM prompt and persistence.
+    """
+    return {
+        "text": text,
+        "inference": inference,
+        "sentiment": inference.sentiment,
+        "clickbait_analysis": clickbait_analysis,
+        "ner_counts": ner_counts,
+        "total_words": total_words
+    }
+
+def extract_features(text, sentiment_analyzer=None, model_dir=None, inference=None):
     """
     Aggregate all text features into a single dictionary.
     
@@ -105,26 +257,42 @@ def extract_features(text, sentiment_analyzer=None, model_dir=None):
         sentiment_analyzer (SentimentAnalyzer, optional): Pre-initialized analyzer. 
                                                          If None, will create new one (SLOW).
         model_dir (str, optional): Path to model if initializing new analyzer.
+        inference (InferenceResult, optional): Result of a forward pass already run on `text`.
+                                               When given, the model is not run again.
     """
-    if sentiment_analyzer is None:
-        if model_dir is None:
-             raise ValueError("Must provide sentiment_analyzer instance OR model_dir")
-        sentiment_analyzer = SentimentAnalyzer(model_dir=model_dir)
+    if inference is None:
+        if sentiment_analyzer is None:
+            if model_dir is None:
+                 raise ValueError("Must provide inference, sentiment_analyzer instance OR model_dir")
+            sentiment_analyzer = SentimentAnalyzer(model_dir=model_dir)
+        inference = sentiment_analyzer.infer(text)
 
-    clickbait_detector = ClickbaitDetector()
-    ner_counter = NERCounter()
+    return assemble_features(
+        text=text,
+        inference=inference,
+        clickbait_analysis=detect_clickbait(text),
+        ner_counts=count_entities(text),
+        total_words=count_words(text)
+    )
 
-    sentiment = sentiment_analyzer.analyze(text)
-    clickbait_info = clickbait_detector.detect(text)
-    ner_counts = ner_counter.count_entities(text)
+def extract_features_batch(texts, inferences, ner_batch_size=None):
+    """
+    Batched counterpart of extract_features for pre-computed inference results.
+    NER runs through nlp.pipe instead of one pipeline call per text.
+    """
+    clickbait_detector = shared_detector()
+    ner_counts = count_entities_batch(texts, batch_size=ner_batch_size)
 
-    return {
-        "text": text,
-        "sentiment": sentiment,
-        "clickbait_analysis": clickbait_info,
-        "ner_counts": ner_counts,
-        "total_words": len(text.split())
-    }
+    return [
+        assemble_features(
+            text=text,
+            inference=inference,
+            clickbait_analysis=clickbait_detector.detect(text),
+            ner_counts=counts,
+            total_words=count_words(text)
+        )
+        for text, inference, counts in zip(texts, inferences, ner_counts)
+    ]
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for multi-process serving on all cores
+
+    gunicorn main:app -c gunicorn.conf.py
+
+The app (and AraBERT's weights) is imported once in the master and workers are
+forked from it, so the weights are shared copy-on-write instead of loaded per
+worker. Each worker gets an even share of the CPUs for torch's intra-op pool.
+"""
+import os
+
+from execution import available_cpus, threads_per_worker
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(available_cpus())))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Model load + warm-up can exceed gunicorn's default 30s boot window
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+preload_app = os.getenv("PRELOAD_MODEL", "true").lower() == "true"
+
+# Read by main.py at import time, i.e. in the master before forking
+os.environ["PRELOAD_MODEL"] = "true" if preload_app else "false"
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ.setdefault("INFERENCE_THREADS", str(threads_per_worker(workers)))
+# Each worker already owns a CPU share; keep the Rust tokenizer from spawning its own pool
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
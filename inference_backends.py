@@ -0,0 +1,347 @@
+"""
+Inference backends for the AraBERT classifier: PyTorch FP32, PyTorch dynamic INT8 and ONNX Runtime
+
+Usage:
+    python inference_backends.py export-onnx --quantize          # writes onnx/model.onnx and onnx/model.int8.onnx
+    python inference_backends.py parity --backend onnx --samples articles.jsonl
+    python inference_backends.py parity --backend torch-int8
+
+The serving backend is chosen with INFERENCE_BACKEND. Every backend takes the padded
+tensors built by SentimentAnalyzer.collate and returns a [batch, num_labels] logits
+tensor, so tokenization, batching and InferenceResult are shared by all of them.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger("inference_backends")
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def _onnxruntime_available() -> bool:
+    try:
+        import onnxruntime  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class TorchBackend:
+    """FP32 PyTorch model (the reference backend)"""
+    name = "torch"
+
+    def __init__(self, model):
+        self.model = model
+        self.model.eval()
+
+    def forward(self, inputs: dict) -> "torch.Tensor":
+        import torch
+
+        with torch.inference_mode():
+            return self.model(**inputs).logits
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    PyTorch dynamic quantization: Linear weights stored as INT8, activations
+    quantized on the fly. No calibration data or export step; quantizing at load
+    takes a few seconds and roughly quarters the encoder's weight memory.
+    """
+    name = "torch-int8"
+
+    def __init__(self, model):
+        import torch
+
+        model.eval()
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized)
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session over a graph exported by `export-onnx`"""
+    name = "onnx"
+
+    def __init__(self, onnx_path: str, intra_op_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.model = None
+
+    def forward(self, inputs: dict) -> "torch.Tensor":
+        import torch
+
+        feeds = {name: inputs[name].numpy() for name in self.input_names if name in inputs}
+        return torch.from_numpy(self.session.run(None, feeds)[0])
+
+
+def default_onnx_path(model_dir: str, quantized: bool = True) -> str:
+    return os.path.join(model_dir, "onnx", "model.int8.onnx" if quantized else "model.onnx")
+
+
+def load_backend(model_dir: str, name: Optional[str] = None, onnx_path: Optional[str] = None, intra_op_threads: Optional[int] = None):
+    """
+    Backend named by `name` (default: INFERENCE_BACKEND, "torch").
+    The ONNX graph defaults to ONNX_MODEL_PATH, then onnx/model.int8.onnx, then
+    onnx/model.onnx. If ONNX Runtime or the graph is missing, falls back to FP32 torch.
+    """
+    name = name or os.getenv("INFERENCE_BACKEND", "torch")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {name!r}; expected one of {BACKENDS}")
+    if intra_op_threads is None:
+        intra_op_threads = int(os.getenv("INFERENCE_THREADS", "0"))
+
+    if name == "onnx":
+        onnx_path = onnx_path or os.getenv("ONNX_MODEL_PATH") or default_onnx_path(model_dir)
+        if not os.path.exists(onnx_path) and os.path.exists(default_onnx_path(model_dir, quantized=False)):
+            onnx_path = default_onnx_path(model_dir, quantized=False)
+        if not _onnxruntime_available():
+            logger.warning("INFERENCE_BACKEND=onnx but the 'onnxruntime' package is not installed; using torch")
+        elif not os.path.exists(onnx_path):
+            logger.warning(f"ONNX graph {onnx_path} not found (run `python inference_backends.py export-onnx`); using torch")
+        else:
+            backend = OnnxBackend(onnx_path, intra_op_threads)
+            logger.info(f"Inference backend: onnx ({onnx_path})")
+            return backend
+        name = "torch"
+
+    model = load_model(model_dir)
+    backend = QuantizedTorchBackend(model) if name == "torch-int8" else TorchBackend(model)
+    logger.info(f"Inference backend: {backend.name}")
+    return backend
+
+
+def load_model(model_dir: str, use_mmap: Optional[bool] = None):
+    """
+    BertForSequenceClassification from `model_dir`. With MODEL_MMAP (default) the
+    weights of model.safetensors are memory-mapped instead of read and copied:
+    pages load on first use and stay shared with other processes through the page
+    cache. Falls back to from_pretrained when the checkpoint doesn't map cleanly.
+    """
+    from transformers import BertForSequenceClassification
+
+    if use_mmap is None:
+        use_mmap = os.getenv("MODEL_MMAP", "true").lower() == "true"
+    weights_path = os.path.join(model_dir, "model.safetensors")
+    if use_mmap and os.path.exists(weights_path):
+        try:
+            return _load_model_mmap(model_dir, weights_path)
+        except Exception as e:
+            logger.warning(f"Memory-mapped load failed, using from_pretrained: {e}")
+    return BertForSequenceClassification.from_pretrained(model_dir)
+
+
+def _load_model_mmap(model_dir: str, weights_path: str):
+    from transformers import AutoConfig, BertForSequenceClassification
+
+    try:
+        from transformers.modeling_utils import no_init_weights
+    except ImportError:
+        no_init_weights = nullcontext
+
+    config = AutoConfig.from_pretrained(model_dir)
+    state = mmap_safetensors(weights_path)
+    # The random init would be overwritten anyway
+    with no_init_weights():
+        model = BertForSequenceClassification(config)
+    missing = [name for name in model.state_dict() if name not in state]
+    if missing:
+        raise KeyError(f"{len(missing)} weights missing from {weights_path} (e.g. {missing[0]})")
+    model.load_state_dict(state, strict=False, assign=True)
+    model.tie_weights()
+    return model
+
+
+_SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool"
+}
+
+
+def mmap_safetensors(path: str) -> dict:
+    """
+    Tensors of a .safetensors file as views of a private (copy-on-write) mmap.
+    Layout: 8-byte little-endian header size, JSON header, then raw tensor data.
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = getattr(torch, _SAFETENSORS_DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        if count == 0:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        # The tensor holds a reference to the mapping, which stays open while any weight is alive
+        tensors[name] = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + begin).view(info["shape"])
+    return tensors
+
+
+def export_onnx(model_dir: str, output: str, quantize: bool = False, opset: int = 17) -> List[str]:
+    """Export the FP32 model with dynamic batch/sequence axes; optionally add a dynamic INT8 copy"""
+    import torch
+    from feature_extractor import load_tokenizer
+
+    model = load_model(model_dir, use_mmap=False)
+    model.eval()
+    tokenizer = load_tokenizer(model_dir)
+    sample = tokenizer(["نص تجريبي للتصدير", "نص آخر"], padding=True, return_tensors="pt")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS}
+    dynamic_axes["logits"] = {0: "batch"}
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+        output,
+        input_names=list(ONNX_INPUTS),
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=opset
+    )
+    written = [output]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = output[:-len(".onnx")] + ".int8.onnx" if output.endswith(".onnx") else output + ".int8"
+        quantize_dynamic(output, quantized_path, weight_type=QuantType.QInt8)
+        written.append(quantized_path)
+    return written
+
+
+DEFAULT_PARITY_TEXTS = [
+    "عاجل: فضيحة كبرى في العاصمة لن تصدق ما حدث",
+    "أعلنت وزارة الصحة اليوم عن افتتاح مستشفى جديد في المدينة",
+    "شاهد قبل الحذف: مفاجأة صادمة عن المشاهير",
+    "ارتفعت أسعار النفط في الأسواق العالمية بنسبة طفيفة",
+    "قال رئيس الوزراء إن الحكومة ستعلن خطة اقتصادية جديدة الأسبوع المقبل",
+    "خطير جدا: دواء سحري يشفي جميع الأمراض خلال يومين"
+]
+
+
+def load_samples(path: Optional[str], text_field: str = "news_text", limit: int = 200) -> List[str]:
+    """Texts from a JSONL file (`text_field`, or a bare string per line); built-in samples without a file"""
+    if not path:
+        return list(DEFAULT_PARITY_TEXTS)
+    texts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            text = record.get(text_field) if isinstance(record, dict) else record
+            if isinstance(text, str) and text.strip():
+                texts.append(text)
+            if len(texts) >= limit:
+                break
+    return texts
+
+
+def parity_report(model_dir: str, reference, candidate, texts: List[str], batch_size: int = 8) -> dict:
+    """Compare a candidate backend's logits and labels with the FP32 reference on the same encodings"""
+    from feature_extractor import SentimentAnalyzer, load_tokenizer
+
+    tokenizer = load_tokenizer(model_dir)
+    analyzer = SentimentAnalyzer(tokenizer=tokenizer, backend=reference, encoding_cache_size=0)
+
+    max_abs_diff = 0.0
+    agree = 0
+    timings = {"reference_ms": 0.0, "candidate_ms": 0.0}
+    for i in range(0, len(texts), batch_size):
+        inputs = analyzer.collate(analyzer.encode_batch(texts[i:i + batch_size]))
+        started = time.perf_counter()
+        expected = reference.forward(inputs)
+        timings["reference_ms"] += (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        actual = candidate.forward(inputs)
+        timings["candidate_ms"] += (time.perf_counter() - started) * 1000
+
+        max_abs_diff = max(max_abs_diff, (expected - actual).abs().max().item())
+        agree += (expected.argmax(dim=-1) == actual.argmax(dim=-1)).sum().item()
+
+    return {
+        "backend": candidate.name,
+        "samples": len(texts),
+        "max_abs_logit_diff": round(max_abs_diff, 6),
+        "label_agreement": round(agree / len(texts), 4) if texts else 1.0,
+        "reference_ms": round(timings["reference_ms"], 1),
+        "candidate_ms": round(timings["candidate_ms"], 1),
+        "speedup": round(timings["reference_ms"] / timings["candidate_ms"], 2) if timings["candidate_ms"] else None
+    }
+
+
+def parse_args(argv=None):
+    model_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Export and validate AraBERT inference backends")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export-onnx", help="Export the model to ONNX (optionally also dynamic INT8)")
+    export.add_argument("--model-dir", default=model_dir, help="Directory with config.json and the weights")
+    export.add_argument("-o", "--output", default=None, help="Output .onnx path (default: <model-dir>/onnx/model.onnx)")
+    export.add_argument("--quantize", action="store_true", help="Also write a dynamically quantized INT8 graph")
+    export.add_argument("--opset", type=int, default=17)
+
+    parity = commands.add_parser("parity", help="Compare a backend's logits with FP32 torch on sample texts")
+    parity.add_argument("--backend", choices=[b for b in BACKENDS if b != "torch"], required=True)
+    parity.add_argument("--model-dir", default=model_dir)
+    parity.add_argument("--onnx-path", default=None, help="Graph to check (default as for serving)")
+    parity.add_argument("--samples", default=None, help="JSONL file of texts (default: built-in samples)")
+    parity.add_argument("--text-field", default="news_text")
+    parity.add_argument("--limit", type=int, default=200, help="Max samples read from --samples")
+    parity.add_argument("--min-agreement", type=float, default=0.99, help="Fail below this label agreement")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+
+    if args.command == "export-onnx":
+        output = args.output or default_onnx_path(args.model_dir, quantized=False)
+        for path in export_onnx(args.model_dir, output, quantize=args.quantize, opset=args.opset):
+            print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        return
+
+    texts = load_samples(args.samples, args.text_field, args.limit)
+    if not texts:
+        sys.exit("No sample texts found")
+    reference = load_backend(args.model_dir, "torch")
+    candidate = load_backend(args.model_dir, args.backend, onnx_path=args.onnx_path)
+    if candidate.name != args.backend:
+        sys.exit(f"Backend {args.backend} could not be loaded")
+    report = parity_report(args.model_dir, reference, candidate, texts)
+    print(json.dumps(report, indent=2))
+    if report["label_agreement"] < args.min_agreement:
+        sys.exit(f"Label agreement {report['label_agreement']} is below {args.min_agreement}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Dynamic micro-batching inference engine for the AraBERT classifier
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from execution import ExecutorSaturated
+from feature_extractor import SentimentAnalyzer, InferenceResult
+from metrics import metrics
+
+logger = logging.getLogger("inference_engine")
+
+queue_depth = metrics.gauge("inference_queue_depth", "Texts waiting for the next inference batch")
+rejected = metrics.counter("inference_rejected_total", "Texts rejected because the inference queue was full")
+batch_size_hist = metrics.histogram(
+    "inference_batch_size", "Texts per scheduled batch", buckets=[1, 2, 4, 8, 16, 32, 64, 128]
+)
+bucket_size_hist = metrics.histogram(
+    "inference_bucket_size", "Texts per padded forward pass", buckets=[1, 2, 4, 8, 16, 32, 64, 128]
+)
+batch_wait_ms = metrics.histogram("inference_batch_wait_ms", "Time the oldest text waited for its batch to close")
+batch_latency_ms = metrics.histogram("inference_batch_latency_ms", "Tokenization + forward time per batch")
+padding_ratio = metrics.histogram(
+    "inference_padding_ratio", "Share of padded positions per forward pass", buckets=[0.05, 0.1, 0.25, 0.5, 0.75, 1.0]
+)
+
+
+class BatchingInferenceEngine:
+    """
+    Collects concurrent inference requests for a short window and runs them together.
+
+    Pending texts are gathered until `max_batch_size` is reached or `max_wait_ms` has
+    elapsed since the first one arrived. The batch is then sorted by token length and
+    split into buckets of at most `max_batch_size` texts whose lengths differ by at
+    most `bucket_width` tokens, so that
+    each padded forward pass wastes little compute on padding. Every caller awaits a
+    future that resolves with its own InferenceResult. Once `max_queue_size` texts are
+    waiting, new requests are rejected with ExecutorSaturated.
+    """
+
+    def __init__(
+        self,
+        analyzer: SentimentAnalyzer,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        bucket_width: int = 64,
+        max_queue_size: int = 256,
+        retry_after: int = 1,
+        executor: Optional[ThreadPoolExecutor] = None
+    ):
+        self.analyzer = analyzer
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.bucket_width = max(1, bucket_width)
+        self.max_queue_size = max(1, max_queue_size)
+        self.retry_after = retry_after
+
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the scheduler task on the running event loop"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run(), name="inference-batcher")
+        logger.info(
+            f"Batching inference engine started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f}, bucket_width={self.bucket_width})"
+        )
+
+    async def stop(self):
+        """Stop the scheduler and fail any request still waiting"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference engine stopped"))
+        queue_depth.set(0)
+
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    async def infer(self, text: str) -> InferenceResult:
+        """Queue a text for the next batch and wait for its result"""
+        if self._worker is None:
+            raise RuntimeError("Inference engine is not running")
+        if self._queue.qsize() >= self.max_queue_size:
+            rejected.inc()
+            raise ExecutorSaturated("inference_queue", self.retry_after)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        queue_depth.set(self._queue.qsize())
+        return await future
+
+    async def infer_many(self, texts: List[str]) -> List[InferenceResult]:
+        """
+        Classify a caller-supplied batch directly (bulk endpoints).
+        Bypasses the request queue but uses the same bucketing and inference thread.
+        """
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        results = await loop.run_in_executor(self._executor, self._infer_bucketed, texts)
+        batch_size_hist.observe(len(texts))
+        batch_latency_ms.observe((time.perf_counter() - started) * 1000)
+        return results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            queue_depth.set(self._queue.qsize())
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+
+            batch_size_hist.observe(len(batch))
+            batch_wait_ms.observe((time.perf_counter() - batch[0][2]) * 1000)
+
+            texts = [text for text, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self._infer_bucketed, texts)
+            except Exception as e:
+                logger.error(f"Batch inference failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            batch_latency_ms.observe((time.perf_counter() - started) * 1000)
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _infer_bucketed(self, texts: List[str]) -> List[InferenceResult]:
+        """Tokenize, group by length and run one padded forward pass per bucket"""
+        encodings = self.analyzer.encode_batch(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i]["input_ids"]))
+
+        results: List[Optional[InferenceResult]] = [None] * len(texts)
+        for bucket in self._buckets(order, encodings):
+            lengths = [len(encodings[i]["input_ids"]) for i in bucket]
+            padded = max(lengths) * len(bucket)
+            padding_ratio.observe((padded - sum(lengths)) / padded)
+            bucket_size_hist.observe(len(bucket))
+
+            bucket_results = self.analyzer.infer_encoded(
+                [texts[i] for i in bucket], [encodings[i] for i in bucket]
+            )
+            for i, result in zip(bucket, bucket_results):
+                results[i] = result
+        return results
+
+    def _buckets(self, order: List[int], encodings: list) -> List[List[int]]:
+        buckets = []
+        current: List[int] = []
+        current_min = 0
+        for i in order:
+            length = len(encodings[i]["input_ids"])
+            if current and (length - current_min > self.bucket_width or len(current) >= self.max_batch_size):
+                buckets.append(current)
+                current = []
+            if not current:
+                current_min = length
+            current.append(i)
+        if current:
+            buckets.append(current)
+        return buckets
@@ -0,0 +1,262 @@
+"""
+Async OpenRouter HTTP client with a persistent connection pool, timeouts and retries
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from metrics import metrics
+
+logger = logging.getLogger("llm_client")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+request_latency_ms = metrics.histogram("llm_request_latency_ms", "OpenRouter request latency including retries")
+retries_total = metrics.counter("llm_retries_total", "OpenRouter requests retried")
+errors_total = metrics.counter("llm_errors_total", "OpenRouter requests that failed after all retries")
+
+
+class LLMClientError(Exception):
+    """Raised when the provider returns a non-retryable error or retries are exhausted"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class OpenRouterClient:
+    """
+    Keeps one httpx.AsyncClient (keep-alive, optional HTTP/2) per event loop so that
+    explanation calls reuse warm TCP+TLS connections instead of handshaking each time.
+
+    Timeouts are split into connect / read / pool stages plus an overall deadline that
+    covers every retry. 429 and 5xx responses are retried with full-jitter exponential
+    backoff, honoring the provider's Retry-After header when present.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        api_base: str = "https://openrouter.ai/api/v1",
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        total_timeout: float = 45.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.api_key = api_key
+        self.api_base = api_base.rstrip("/")
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Custom transport (e.g. httpx.MockTransport) to run against a local stub
+        self.transport = transport
+
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1 keep-alive")
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop = None
+
+    @classmethod
+    def from_env(cls, api_key: Optional[str], api_base: str) -> "OpenRouterClient":
+        return cls(
+            api_key=api_key,
+            api_base=api_base,
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "30")),
+            total_timeout=float(os.getenv("LLM_TOTAL_TIMEOUT", "45")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            http2=os.getenv("LLM_HTTP2", "true").lower() == "true"
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_base,
+                http2=self.http2,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections
+                ),
+                timeout=httpx.Timeout(
+                    connect=self.connect_timeout,
+                    read=self.read_timeout,
+                    write=self.connect_timeout,
+                    pool=self.connect_timeout
+                ),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                }
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+    async def chat_completion(self, payload: dict) -> dict:
+        """POST /chat/completions and return the decoded JSON body"""
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.total_timeout
+        try:
+            return await asyncio.wait_for(self._post_with_retries("/chat/completions", payload, deadline), self.total_timeout)
+        except asyncio.TimeoutError:
+            errors_total.inc()
+            raise LLMClientError(f"OpenRouter request exceeded total timeout of {self.total_timeout}s")
+        finally:
+            request_latency_ms.observe((time.perf_counter() - started) * 1000)
+
+    async def stream_chat_completion(self, payload: dict) -> AsyncIterator[dict]:
+        """
+        POST /chat/completions with `stream: true` and yield each decoded SSE chunk.
+        Retries apply only until the first byte; once tokens flow, errors are raised.
+        """
+        payload = dict(payload, stream=True, stream_options={"include_usage": True})
+        deadline = time.monotonic() + self.total_timeout
+        client = self._get_client()
+        attempt = 0
+        streaming = False
+        while True:
+            retry_after = None
+            try:
+                async with client.stream("POST", "/chat/completions", json=payload) as response:
+                    if response.status_code == 200:
+                        async for line in response.aiter_lines():
+                            if time.monotonic() > deadline:
+                                errors_total.inc()
+                                raise LLMClientError(f"OpenRouter stream exceeded total timeout of {self.total_timeout}s")
+                            if not line.startswith("data:"):
+                                continue  # comments / keep-alives
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                return
+                            streaming = True
+                            yield json.loads(data)
+                        return
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    if response.status_code not in RETRYABLE_STATUS:
+                        errors_total.inc()
+                        raise LLMClientError(
+                            f"OpenRouter API error: {response.status_code} - {body}",
+                            status_code=response.status_code
+                        )
+                    retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                    failure = f"status {response.status_code}"
+            except httpx.TransportError as e:
+                if streaming:
+                    # Tokens were already delivered; a retry would duplicate them
+                    errors_total.inc()
+                    raise LLMClientError(f"OpenRouter stream interrupted: {type(e).__name__}: {e}")
+                failure = f"{type(e).__name__}: {e}"
+
+            if attempt >= self.max_retries:
+                errors_total.inc()
+                raise LLMClientError(f"OpenRouter stream failed after {attempt + 1} attempts ({failure})")
+
+            delay = self._retry_delay(attempt, retry_after, deadline, failure)
+            logger.warning(f"OpenRouter stream failed ({failure}), retrying in {delay:.2f}s")
+            retries_total.inc()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _post_with_retries(self, path: str, payload: dict, deadline: float) -> dict:
+        client = self._get_client()
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = await client.post(path, json=payload)
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRYABLE_STATUS:
+                    errors_total.inc()
+                    raise LLMClientError(
+                        f"OpenRouter API error: {response.status_code} - {response.text}",
+                        status_code=response.status_code
+                    )
+                retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                failure = f"status {response.status_code}"
+            except httpx.TransportError as e:
+                failure = f"{type(e).__name__}: {e}"
+
+            if attempt >= self.max_retries:
+                errors_total.inc()
+                raise LLMClientError(f"OpenRouter request failed after {attempt + 1} attempts ({failure})")
+
+            delay = self._retry_delay(attempt, retry_after, deadline, failure)
+            logger.warning(f"OpenRouter request failed ({failure}), retrying in {delay:.2f}s")
+            retries_total.inc()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[float], deadline: float, failure: str) -> float:
+        """
+        Delay before the next attempt. When it would end past the overall deadline
+        (e.g. a long Retry-After), fail now rather than retrying earlier than asked.
+        """
+        delay = self._backoff_delay(attempt, retry_after)
+        if time.monotonic() + delay > deadline:
+            errors_total.inc()
+            hint = f"Retry-After {retry_after:.0f}s" if retry_after is not None else f"backoff {delay:.2f}s"
+            raise LLMClientError(
+                f"OpenRouter request failed ({failure}); {hint} exceeds the total timeout of {self.total_timeout}s"
+            )
+        return delay
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            # Honor the server's hint in full (the deadline bounds it), plus a little
+            # jitter to avoid a thundering herd
+            return retry_after + random.uniform(0, self.backoff_base)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Retry-After is either delta-seconds or an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
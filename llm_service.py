@@ -4,9 +4,10 @@ LLM Service for generating explanations and credibility scores
 import os
 import json
 import logging
-from typing import Tuple, Optional
+from typing import AsyncIterator, Tuple, Optional
 from dotenv import load_dotenv
-import requests
+
+from llm_client import OpenRouterClient, LLMClientError
 
 load_dotenv()
 logger = logging.getLogger("llm_service")
@@ -18,13 +19,18 @@ class LLMExplainer:
     
     def __init__(self):
         self.api_key = os.getenv("OPENROUTER_API_KEY")
-        self.api_base = "https://openrouter.ai/api/v1"
+        self.api_base = os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1")
         self.model = "anthropic/claude-3.5-sonnet"
+        self.client = OpenRouterClient.from_env(self.api_key, self.api_base)
         
         if not self.api_key:
             logger.warning("OPENROUTER_API_KEY not found in environment")
     
-    def generate_explanation(
+    async def aclose(self):
+        """Close pooled connections to the provider"""
+        await self.client.aclose()
+    
+    async def generate_explanation(
         self,
         news_text: str,
         is_fake: bool,
@@ -54,56 +60,95 @@ class LLMExplainer:
         )
         
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.5,
-                "max_tokens": 500,
-            }
-            
-            response = requests.post(
-                f"{self.api_base}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-                return self._get_fallback_explanation(
-                    is_fake=is_fake,
-                    sentiment=sentiment,
-                    is_clickbait=is_clickbait,
-                    entities=entities,
-                    news_text=news_text
-                ), 0, 0
-            
-            data = response.json()
+            data = await self.client.chat_completion(self._build_payload(prompt))
             explanation = data["choices"][0]["message"]["content"].strip()
             prompt_tokens = data.get("usage", {}).get("prompt_tokens", 0)
             completion_tokens = data.get("usage", {}).get("completion_tokens", 0)
             
             return explanation, prompt_tokens, completion_tokens
             
+        except LLMClientError as e:
+            logger.error(str(e))
         except Exception as e:
             logger.error(f"Error calling OpenRouter API: {str(e)}")
-            return self._get_fallback_explanation(
-                is_fake=is_fake,
-                sentiment=sentiment,
-                is_clickbait=is_clickbait,
-                entities=entities,
-                news_text=news_text
-            ), 0, 0
+        
+        return self._get_fallback_explanation(
+            is_fake=is_fake,
+            sentiment=sentiment,
+            is_clickbait=is_clickbait,
+            entities=entities,
+            news_text=news_text
+        ), 0, 0
+    
+    async def stream_explanation(
+        self,
+        news_text: str,
+        is_fake: bool,
+        model_confidence: float,
+        sentiment: str,
+        is_clickbait: bool,
+        entities: dict,
+        use_llm: bool = True
+    ) -> AsyncIterator[dict]:
+        """
+        Stream the explanation as the provider generates it.
+        
+        Yields {"type": "token", "text": ...} events followed by a single
+        {"type": "usage", "prompt_tokens": ..., "completion_tokens": ...} event.
+        If the provider fails before the first token (or use_llm is False),
+        the fallback explanation is yielded as one token instead. If it fails
+        after tokens were sent, an {"type": "error", "message": ...} event is
+        yielded before the usage event: the streamed text is truncated.
+        """
+        prompt_tokens, completion_tokens = 0, 0
+        streamed = False
+        
+        if self.api_key and use_llm:
+            prompt = self._build_prompt(
+                news_text, is_fake, model_confidence, sentiment, is_clickbait, entities
+            )
+            try:
+                async for chunk in self.client.stream_chat_completion(self._build_payload(prompt)):
+                    usage = chunk.get("usage") or {}
+                    prompt_tokens = usage.get("prompt_tokens", prompt_tokens)
+                    completion_tokens = usage.get("completion_tokens", completion_tokens)
+                    for choice in chunk.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            streamed = True
+                            yield {"type": "token", "text": delta}
+            except Exception as e:
+                logger.error(f"Error streaming from OpenRouter API: {str(e)}")
+                if streamed:
+                    yield {"type": "error", "message": "Explanation stream interrupted"}
+        
+        if not streamed:
+            yield {
+                "type": "token",
+                "text": self._get_fallback_explanation(
+                    is_fake=is_fake,
+                    sentiment=sentiment,
+                    is_clickbait=is_clickbait,
+                    entities=entities,
+                    news_text=news_text
+                )
+            }
+        
+        yield {"type": "usage", "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+    
+    def _build_payload(self, prompt: str) -> dict:
+        """Chat completion request body"""
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.5,
+            "max_tokens": 500,
+        }
     
     def _build_prompt(
         self,
@@ -1,18 +1,48 @@
-from fastapi import FastAPI, HTTPException, Depends
+import time
+# Startup timing starts here; torch/transformers/spaCy are imported lazily by the startup pipeline
+_process_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 import uvicorn
 import os
+import json
+import asyncio
+import gc
 import logging
 from contextlib import asynccontextmanager
-import torch
-from transformers import BertTokenizer, BertForSequenceClassification
 
 # Import Services
 from db_service import DatabaseService
+from async_db_service import AsyncDatabaseService
 from llm_service import LLMExplainer
-from feature_extractor import SentimentAnalyzer, extract_features
+from feature_extractor import (
+    SentimentAnalyzer, load_tokenizer, extract_features_batch, content_hash,
+    detect_clickbait, count_entities, count_words, assemble_features
+)
+from feature_pipeline import FeaturePipeline, Stage
+from clickbait import shared_detector
+from ner import shared_counter
+from inference_engine import BatchingInferenceEngine
+from inference_backends import load_backend
+from execution import ExecutionPools, AdmissionController, ExecutorSaturated, threads_per_worker
+from explanation_cache import ExplanationCache, CachedExplanation
+from explanation_jobs import ExplanationJobQueue
+from maintenance import PeriodicTask
+from retention import RetentionManager
+from stats_snapshot import StatsSnapshot
+from startup import StartupPipeline
+from write_behind import WriteBehindBuffer
+from metrics import metrics
 from database_models import Analysis
-from api_schemas import AnalyzeRequest, AnalysisResultResponse, HistoryResponse, StatsResponse, HealthResponse
+from api_schemas import (
+    AnalyzeRequest, AnalysisResultResponse, HistoryResponse, StatsResponse, HealthResponse,
+    BatchAnalyzeRequest, BatchAnalyzeResponse, BatchItemResult, ReadinessResponse
+)
+
+_imports_ms = (time.perf_counter() - _process_started) * 1000
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
@@ -21,36 +51,125 @@ logger = logging.getLogger("mesdaq_api")
 # Global State for ML Model
 ml_models = {}
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+dedup_hits = metrics.counter("analyze_dedup_hits_total", "Analyses answered from a stored result of the same text")
+
+# Dedicated executors for blocking work (inference, LLM, DB)
+pools = ExecutionPools.from_env()
+analyze_admission = AdmissionController(
+    "analyze",
+    max_in_flight=int(os.getenv("ANALYZE_MAX_IN_FLIGHT", "64")),
+    retry_after=pools.inference.retry_after
+)
+llm_admission = AdmissionController(
+    "llm",
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "32")),
+    retry_after=pools.inference.retry_after
+)
+# Concurrent LLM calls per /analyze/batch request (cache misses only)
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "32"))
+
+def load_models():
     """
-    Load ML models on startup, clean up on shutdown
+    Load the tokenizer and inference backend into ml_models, once per process.
+    With PRELOAD_MODEL this already ran in the pre-fork parent (see bottom of module).
     """
+    if "sentiment_analyzer" in ml_models:
+        return
     model_dir = os.path.dirname(os.path.abspath(__file__))
     logger.info(f"Loading AraBERT model from {model_dir}...")
     
-    try:
-        # Load model and tokenizer ONCE
-        tokenizer = BertTokenizer.from_pretrained(model_dir)
-        model = BertForSequenceClassification.from_pretrained(model_dir)
-        model.eval()
-        
-        # Store in global state
-        ml_models["tokenizer"] = tokenizer
-        ml_models["model"] = model
-        ml_models["sentiment_analyzer"] = SentimentAnalyzer(model=model, tokenizer=tokenizer)
-        
-        logger.info("AraBERT model loaded successfully!")
-    except Exception as e:
-        logger.error(f"Failed to load ML models: {e}")
-        # We might want to raise here, but for now we'll log it.
-        # Apps without model will fail on analysis but run health checks.
+    # Load model and tokenizer ONCE
+    tokenizer = load_tokenizer(model_dir)
+    # FP32 torch, dynamic INT8 or ONNX Runtime (INFERENCE_BACKEND)
+    backend = load_backend(model_dir)
+    
+    # Store in global state
+    ml_models["tokenizer"] = tokenizer
+    ml_models["model"] = backend
+    ml_models["sentiment_analyzer"] = SentimentAnalyzer(tokenizer=tokenizer, backend=backend)
+
+def set_inference_threads():
+    """
+    torch intra-op threads for this process: INFERENCE_THREADS, or the CPUs divided
+    by WEB_CONCURRENCY so several workers don't oversubscribe the cores.
+    """
+    threads = int(os.getenv("INFERENCE_THREADS", "0"))
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if threads <= 0 and workers > 1:
+        threads = threads_per_worker(workers)
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+        logger.info(f"torch intra-op threads: {threads}")
+
+WARMUP_TEXT = "أعلنت وزارة الصحة اليوم عن افتتاح مستشفى جديد في العاصمة بحضور عدد من المسؤولين"
+
+def _load_ner():
+    shared_counter()
+
+def _warm_up():
+    """
+    A short and a long forward pass plus a spaCy pass, so the first requests don't
+    pay for lazy kernel/allocator initialization.
+    """
+    texts = [WARMUP_TEXT, " ".join([WARMUP_TEXT] * 40)]
+    inferences = ml_models["sentiment_analyzer"].infer_batch(texts)
+    extract_features_batch(texts, inferences)
+
+async def _start_inference_engine():
+    # Micro-batching scheduler in front of the classifier
+    engine = BatchingInferenceEngine(
+        ml_models["sentiment_analyzer"],
+        max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16")),
+        max_wait_ms=float(os.getenv("INFERENCE_MAX_WAIT_MS", "10")),
+        bucket_width=int(os.getenv("INFERENCE_BUCKET_WIDTH", "64")),
+        max_queue_size=pools.inference.max_queue,
+        retry_after=pools.inference.retry_after,
+        executor=pools.inference.executor
+    )
+    await engine.start()
+    ml_models["inference_engine"] = engine
+    logger.info("AraBERT model loaded successfully!")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start loading ML models (in the background, see `startup`), clean up on shutdown
+    """
+    startup.start()
+    if os.getenv("STARTUP_BLOCKING", "false").lower() == "true":
+        # Old behavior: don't accept connections until the models are hot
+        await startup.wait()
+    
+    # Background explanation workers (resume jobs persisted by a previous run)
+    await explanation_jobs.start()
+    stats_reconciler.start()
+    retention_task.start()
+    if os.getenv("CLICKBAIT_KEYWORDS_PATH"):
+        clickbait_reloader.start()
+    if write_behind is not None:
+        await write_behind.start()
     
     yield
     
     # Cleanup if needed
     logger.info("Shutting down...")
+    await startup.stop()
+    await stats_reconciler.stop()
+    await retention_task.stop()
+    await clickbait_reloader.stop()
+    if write_behind is not None:
+        # Drain before the explanation workers stop so persisted rows still get their jobs
+        await write_behind.stop()
+    await explanation_jobs.stop()
+    if "inference_engine" in ml_models:
+        await ml_models["inference_engine"].stop()
+    await llm_service.aclose()
+    if async_db_service is not None:
+        await async_db_service.dispose()
     ml_models.clear()
+    pools.shutdown(wait=False)
 
 app = FastAPI(title="Mesdaq AI API", version="1.0.0", lifespan=lifespan)
 
@@ -63,9 +182,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(ExecutorSaturated)
+async def saturated_handler(request: Request, exc: ExecutorSaturated):
+    """Backpressure: reject with 503 instead of queueing unboundedly"""
+    logger.warning(f"Rejecting {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry later"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Services
 db_service = DatabaseService()
 llm_service = LLMExplainer()
+explanation_cache = ExplanationCache.from_env(db_service=db_service, db_executor=pools.db)
+explanation_jobs = ExplanationJobQueue.from_env(db_service, llm_service, explanation_cache, pools.db)
+stats_snapshot = StatsSnapshot.from_env(db_service, pools.db)
+# Rollups are incremented per write; this recount corrects any drift
+stats_reconciler = PeriodicTask.from_env(
+    "stats_reconcile",
+    lambda: db_service.reconcile_stats(days=int(os.getenv("STATS_RECONCILE_DAYS", "2"))),
+    pools.db,
+    env_var="STATS_RECONCILE_INTERVAL",
+    default_interval=3600
+)
+
+# TTL purge / archiving of old analyses (ANALYSIS_RETENTION_DAYS, off by default)
+retention = RetentionManager.from_env(db_service)
+retention_task = PeriodicTask.from_env("retention", retention.run, pools.db, env_var="RETENTION_INTERVAL", default_interval=86400)
+
+# Clickbait keyword file hot reload; the new matcher is compiled here, not on the request path
+clickbait_reloader = PeriodicTask.from_env(
+    "clickbait_reload",
+    lambda: shared_detector().reload(),
+    pools.features,
+    env_var="CLICKBAIT_RELOAD_INTERVAL",
+    default_interval=5,
+    run_on_start=False
+)
+
+# Model + spaCy load and DB warm-up in parallel, then a warm-up forward pass; /ready
+# reports 200 once done. Apps without a model keep serving health checks (degraded).
+startup = StartupPipeline(
+    [
+        {"model": load_models, "ner": _load_ner, "clickbait": shared_detector, "db": db_service.ping},
+        {"warmup": _warm_up}
+    ],
+    on_ready=_start_inference_engine,
+    started_at=_process_started,
+    imports_ms=_imports_ms
+)
+
+# Optional write-behind buffer for analysis inserts (WRITE_BEHIND=true)
+write_behind = WriteBehindBuffer.from_env(db_service, pools.db)
+
+# Optional native-async data access (aiosqlite/asyncpg); schema is managed by db_service
+async_db_service = AsyncDatabaseService(db_service.database_url) if os.getenv("DB_ASYNC", "false").lower() == "true" else None
 
 def get_db():
     session = db_service.get_session()
@@ -74,14 +246,41 @@ def get_db():
     finally:
         session.close()
 
+async def get_async_db():
+    async with async_db_service.get_session() as session:
+        yield session
+
+def _after_fork():
+    """
+    Runs in each worker forked from a preloading parent: pooled DB connections
+    inherited from the parent must not be shared, and threads are sized per worker.
+    """
+    db_service.engine.dispose(close=False)
+    set_inference_threads()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+# Request-scoped session matching the active data access path
+db_session = get_async_db if async_db_service is not None else get_db
+
+async def _db(method: str, *args, **kwargs):
+    """
+    Call a DatabaseService method by name: awaited natively on AsyncDatabaseService
+    when DB_ASYNC is enabled, otherwise run on the bounded DB thread pool.
+    """
+    if async_db_service is not None:
+        return await getattr(async_db_service, method)(*args, **kwargs)
+    return await pools.db.run(getattr(db_service, method), *args, **kwargs)
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Check system health"""
     model_loaded = "model" in ml_models
     db_connected = True # DB checked on init
     try:
-        # Verify DB connection
-        db_service.get_statistics()
+        # Verify DB connection (SELECT 1, independent of table size)
+        await _db("ping")
     except:
         db_connected = False
         
@@ -93,123 +292,340 @@ async def health_check():
         "version": "1.0.0"
     }
 
-@app.post("/analyze", response_model=AnalysisResultResponse)
-async def analyze_news(request: AnalyzeRequest, session = Depends(get_db)):
+@app.get("/ready", response_model=ReadinessResponse)
+async def readiness_check():
+    """Readiness probe: 503 until models are loaded and warmed up, with per-phase startup timings"""
+    status = startup.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status, headers={"Retry-After": str(pools.inference.retry_after)})
+    return status
+
+@app.get("/metrics")
+async def get_metrics():
+    """In-process metrics (inference queue depth, batch sizes, latencies)"""
+    return metrics.snapshot()
+
+async def _save_analysis(session, news_text, text_hash, inference, features, credibility_score, explanation_text, p_tokens, c_tokens, cache_key=None, on_persisted=None):
     """
-    Main Analysis Endpoint:
-    1. Extract features (Sentiment, Clickbait, NER)
-    2. Classify (Fake/Real)
-    3. Generate LLM Explanation
+    Persist one analysis with its prediction, explanation metadata and stats
+    in a single transaction. Opens its own session when `session` is None.
+    With `explanation_text=None` the explanation is left as a pending background job.
+    `on_persisted(analysis_id)` runs once the row is stored (after the flush when
+    the write-behind buffer is enabled). Returns (analysis_id, created_at).
     """
+    record = _analysis_record(
+        news_text, text_hash, inference, features, credibility_score,
+        explanation_text, p_tokens, c_tokens, cache_key
+    )
+    if write_behind is not None:
+        return await _write_behind(record, on_persisted)
+    saved = await _db("save_analysis", record, session=session)
+    stats_snapshot.invalidate()
+    if on_persisted is not None:
+        on_persisted(saved[0])
+    return saved
+
+async def _write_behind(record, on_persisted=None):
+    """
+    Hand a record to the write-behind buffer and return its preassigned
+    (analysis_id, created_at); inserts synchronously if the buffer is full.
+    """
+    analysis_id, created_at = await write_behind.prepare(record)
     
-    if "sentiment_analyzer" not in ml_models:
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    
-    analyzer = ml_models["sentiment_analyzer"]
-    
-    # 1. Run Inference (Fast)
-    inputs = analyzer.tokenizer(request.news_text, return_tensors="pt", truncation=True, max_length=512)
-    with torch.no_grad():
-        outputs = analyzer.model(**inputs)
-        logits = outputs.logits
-        probs = torch.softmax(logits, dim=1)
-        fake_prob = probs[0][0].item() # Assuming 0 is Fake/Negative
-        real_prob = probs[0][1].item() # Assuming 1 is Real/Positive
-        
-        # Determine label
-        is_fake = fake_prob > real_prob
-        model_confidence = fake_prob if is_fake else real_prob
-    
-    # 2. Extract other features
-    features = extract_features(request.news_text, sentiment_analyzer=analyzer)
-    # features dict: sentiment, clickbait_analysis, ner_counts, total_words
+    def persisted(persisted_id):
+        stats_snapshot.invalidate()
+        if on_persisted is not None:
+            on_persisted(persisted_id)
     
-    # 3. Calculate Credibility Score
-    sentiment = features["sentiment"] 
-    is_clickbait = features["clickbait_analysis"]["is_clickbait"]
-    clickbait_keywords = ", ".join(features["clickbait_analysis"]["found_keywords"])
+    if not write_behind.submit(record, persisted):
+        await pools.db.run(db_service.insert_analyses_bulk, [record])
+        persisted(analysis_id)
+    return analysis_id, created_at
+
+def _analysis_record(news_text, text_hash, inference, features, credibility_score, explanation_text, p_tokens, c_tokens, cache_key=None) -> dict:
+    """Column values for DatabaseService.create_analyses_bulk"""
+    return {
+        "analysis": {
+            "news_text": news_text,
+            "content_hash": text_hash,
+            "is_fake": inference.is_fake,
+            "credibility_score": credibility_score,
+            "explanation": explanation_text,
+            "explanation_status": "ready" if explanation_text is not None else "pending"
+        },
+        "prediction": _prediction_details(inference, features),
+        "explanation": {
+            "llm_model": llm_service.model,
+            "llm_provider": "openrouter",
+            "raw_explanation": explanation_text,
+            "prompt_tokens": p_tokens,
+            "completion_tokens": c_tokens,
+            "cache_key": cache_key
+        } if explanation_text is not None else None
+    }
+
+async def _save_analyses(session, records, on_persisted=None):
+    """
+    Bulk-persist analysis records (and the stats update) in one transaction.
+    If the bulk insert fails, records are retried one by one so a bad row only
+    fails itself. `on_persisted` holds an optional callback per record (see
+    _save_analysis). Returns (analysis_id, created_at) or the exception per record.
+    """
+    callbacks = on_persisted or [None] * len(records)
+    if write_behind is not None:
+        saved = []
+        for record, callback in zip(records, callbacks):
+            try:
+                saved.append(await _write_behind(record, callback))
+            except Exception as item_error:
+                saved.append(item_error)
+        return saved
     
+    try:
+        saved = await _db("create_analyses_bulk", records, session=session)
+    except Exception as e:
+        logger.warning(f"Bulk insert of {len(records)} analyses failed, retrying per item: {e}")
+        saved = []
+        for record in records:
+            try:
+                saved.append(await _db("save_analysis", record, session=session))
+            except Exception as item_error:
+                saved.append(item_error)
+    stats_snapshot.invalidate()
+    for outcome, callback in zip(saved, callbacks):
+        if callback is not None and not isinstance(outcome, Exception):
+            callback(outcome[0])
+    return saved
+
+def _analysis_to_response(analysis: Analysis, deduplicated: bool = False) -> AnalysisResultResponse:
+    """Build the API response from a stored analysis and its related rows"""
+    prediction = analysis.prediction
+    explanation_data = analysis.explanation_data
+    return AnalysisResultResponse(
+        analysis_id=analysis.id,
+        is_fake=analysis.is_fake,
+        credibility_score=analysis.credibility_score,
+        explanation=analysis.explanation,
+        explanation_status=analysis.explanation_status or "ready",
+        prediction_details={
+            "model_confidence": prediction.model_confidence,
+            "logits_fake": prediction.logits_fake,
+            "logits_real": prediction.logits_real,
+            "sentiment": prediction.sentiment,
+            "is_clickbait": prediction.is_clickbait,
+            "clickbait_keywords": prediction.clickbait_keywords,
+            "entity_person_count": prediction.entity_person_count,
+            "entity_org_count": prediction.entity_org_count,
+            "entity_loc_count": prediction.entity_loc_count,
+            "word_count": prediction.word_count
+        },
+        explanation_data={
+            "llm_model": explanation_data.llm_model,
+            "llm_provider": explanation_data.llm_provider,
+            "explanation": explanation_data.raw_explanation,
+            "prompt_tokens": explanation_data.prompt_tokens,
+            "completion_tokens": explanation_data.completion_tokens
+        } if explanation_data else None,
+        created_at=analysis.created_at,
+        deduplicated=deduplicated
+    )
+
+def _prediction_details(inference, features) -> dict:
+    """Model outputs and features as returned in `prediction_details`"""
     entity_counts = features["ner_counts"]
-    entity_total = sum(entity_counts.values())
+    return {
+        "model_confidence": inference.model_confidence,
+        "logits_fake": inference.logits_fake,
+        "logits_real": inference.logits_real,
+        "sentiment": inference.sentiment,
+        "is_clickbait": features["clickbait_analysis"]["is_clickbait"],
+        "clickbait_keywords": ", ".join(features["clickbait_analysis"]["found_keywords"]),
+        "entity_person_count": entity_counts.get("PER", 0),
+        "entity_org_count": entity_counts.get("ORG", 0),
+        "entity_loc_count": entity_counts.get("LOC", 0),
+        "word_count": features["total_words"]
+    }
+
+def _prompt_inputs(inference, features) -> dict:
+    """Classification inputs shared by the LLM prompt and the explanation cache key"""
+    return {
+        "is_fake": inference.is_fake,
+        "model_confidence": inference.model_confidence,
+        "sentiment": inference.sentiment,
+        "is_clickbait": features["clickbait_analysis"]["is_clickbait"],
+        "entities": features["ner_counts"]
+    }
+
+def _credibility_score(inference, features) -> int:
+    entity_total = sum(features["ner_counts"].values())
     entity_diversity = min(1.0, entity_total / 10.0)
-    
-    # 4. Generate LLM Explanation
-    explanation_text, p_tokens, c_tokens = llm_service.generate_explanation(
-        news_text=request.news_text,
-        is_fake=is_fake,
-        model_confidence=model_confidence,
-        sentiment=sentiment,
-        is_clickbait=is_clickbait,
-        entities=entity_counts
-    )
-    
-    # 5. Calculate Final Score
-    credibility_score = llm_service.calculate_credibility_score(
-        is_fake=is_fake,
-        model_confidence=model_confidence,
-        sentiment=sentiment,
-        is_clickbait=is_clickbait,
+    return llm_service.calculate_credibility_score(
+        is_fake=inference.is_fake,
+        model_confidence=inference.model_confidence,
+        sentiment=inference.sentiment,
+        is_clickbait=features["clickbait_analysis"]["is_clickbait"],
         entity_diversity=entity_diversity
     )
-    
-    # 6. Save to Database
-    # Create Analysis
-    analysis = db_service.create_analysis(
-        news_text=request.news_text,
-        is_fake=is_fake,
-        credibility_score=credibility_score,
-        explanation=explanation_text, 
-        session=session
+
+async def _find_duplicate(request: AnalyzeRequest, text_hash: str, session):
+    """Stored analysis of the same normalized text, unless a recompute is forced"""
+    if request.force_recompute:
+        return None
+    return await _db("get_analysis_by_content_hash", text_hash, session=session)
+
+def _has_llm_explanation(analysis: Analysis) -> bool:
+    """Whether a stored analysis' explanation came from the LLM (fresh, or through the explanation cache)"""
+    data = analysis.explanation_data
+    return (
+        analysis.explanation_status == "ready"
+        and data is not None
+        and ((data.completion_tokens or 0) > 0 or data.cache_key is not None)
     )
+
+def _stored_prompt_inputs(analysis: Analysis) -> dict:
+    """Explanation prompt inputs (and cache key inputs) of a stored analysis"""
+    prediction = analysis.prediction
+    return {
+        "is_fake": analysis.is_fake,
+        "model_confidence": prediction.model_confidence,
+        "sentiment": prediction.sentiment,
+        "is_clickbait": prediction.is_clickbait,
+        "entities": {
+            "PER": prediction.entity_person_count or 0,
+            "ORG": prediction.entity_org_count or 0,
+            "LOC": prediction.entity_loc_count or 0
+        }
+    }
+
+async def _serve_duplicate(analysis: Analysis, async_explanation: bool) -> AnalysisResultResponse:
+    """
+    Answer with a stored analysis of the same text. Its verdict is always reused.
+    An explanation that is only the local fallback or a failed job is regenerated
+    for the same row: inline, or as a background job with `async_explanation`. A
+    pending job is returned as pending.
+    """
+    dedup_hits.inc()
+    settled = analysis.explanation_status in ("ready", "failed")
+    if not settled or _has_llm_explanation(analysis) or not llm_service.api_key:
+        return _analysis_to_response(analysis, deduplicated=True)
     
-    # Create Prediction
-    db_service.create_prediction(
-        analysis_id=analysis.id,
-        model_confidence=model_confidence,
-        logits_fake=outputs.logits[0][0].item(), 
-        logits_real=outputs.logits[0][1].item(),
-        sentiment=sentiment,
-        is_clickbait=is_clickbait,
-        clickbait_keywords=clickbait_keywords,
-        entity_person_count=entity_counts.get("PER", 0),
-        entity_org_count=entity_counts.get("ORG", 0),
-        entity_loc_count=entity_counts.get("LOC", 0),
-        word_count=features["total_words"],
-        session=session
+    if async_explanation:
+        if await pools.db.run(db_service.requeue_explanation, analysis.id):
+            explanation_jobs.enqueue(analysis.id)
+    else:
+        explanation_text, p_tokens, c_tokens, cache_key = await explanation_cache.get_or_generate(
+            llm_service, analysis.news_text, admission=llm_admission, **_stored_prompt_inputs(analysis)
+        )
+        if cache_key is None and analysis.explanation is not None:
+            # The LLM is still failing; keep the stored fallback text
+            return _analysis_to_response(analysis, deduplicated=True)
+        await pools.db.run(
+            db_service.attach_explanation, analysis.id, llm_service.model, "openrouter",
+            explanation_text, p_tokens, c_tokens, cache_key
+        )
+    return _analysis_to_response(await _db("get_analysis_by_id", analysis.id), deduplicated=True)
+
+def _inference_engine() -> BatchingInferenceEngine:
+    if "inference_engine" in ml_models:
+        return ml_models["inference_engine"]
+    if startup.error is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is warming up",
+            headers={"Retry-After": str(pools.inference.retry_after)}
+        )
+    raise HTTPException(status_code=503, detail="Model not loaded")
+
+async def _classify(text: str):
+    return await _inference_engine().infer(text)
+
+async def _explain(text: str, inference, features):
+    """(explanation, prompt_tokens, completion_tokens, cache_key): content-addressed cache first, then the LLM"""
+    return await explanation_cache.get_or_generate(
+        llm_service, text, admission=llm_admission, **_prompt_inputs(inference, features)
     )
+
+# Classifier (micro-batched), clickbait, NER and word count run concurrently; the
+# LLM call starts as soon as the classifier and features are in
+feature_pipeline = FeaturePipeline([
+    Stage("inference", _classify),
+    Stage("clickbait_analysis", detect_clickbait, executor=pools.features),
+    Stage("ner_counts", count_entities, executor=pools.features),
+    Stage("total_words", count_words),
+    Stage("features", assemble_features, inputs=("text", "inference", "clickbait_analysis", "ner_counts", "total_words")),
+    Stage("explanation", _explain, inputs=("text", "inference", "features"))
+])
+
+async def _run_models(news_text: str):
+    """Classifier (single forward pass, sentiment included) and feature extraction"""
+    result = await feature_pipeline.run(news_text, targets=("features",))
+    # features dict: inference, sentiment, clickbait_analysis, ner_counts, total_words
+    return result["inference"], result["features"]
+
+@app.post("/analyze", response_model=AnalysisResultResponse)
+async def analyze_news(request: AnalyzeRequest, session = Depends(db_session)):
+    """
+    Main Analysis Endpoint:
+    1. Classify (Fake/Real, Sentiment) and extract features (Clickbait, NER) concurrently
+    2. Generate LLM Explanation as soon as both are done
     
-    # Create Explanation Metadata
-    db_service.create_explanation(
-        analysis_id=analysis.id,
-        llm_model=llm_service.model,
-        llm_provider="openrouter",
-        raw_explanation=explanation_text,
-        prompt_tokens=p_tokens,
-        completion_tokens=c_tokens,
-        session=session
-    )
+    Blocking steps run on dedicated executors; when they are saturated the request
+    is rejected with 503 + Retry-After.
+    
+    Identical texts (after Arabic normalization) return the stored analysis
+    without re-inference unless `force_recompute` is set.
+    
+    With `async_explanation` the verdict is returned immediately and the
+    explanation is generated by a background worker; poll GET /analysis/{id}.
+    """
     
-    # Update stats
-    db_service.update_daily_stats(session=session)
+    text_hash = content_hash(request.news_text)
+    previous = await _find_duplicate(request, text_hash, session)
+    if previous is not None:
+        return await _serve_duplicate(previous, request.async_explanation)
+    
+    with analyze_admission:
+        # 1-2. Feature pipeline: classifier and extractors in parallel, then the explanation
+        targets = ("features",) if request.async_explanation else ("features", "explanation")
+        result = await feature_pipeline.run(request.news_text, targets=targets)
+        inference, features = result["inference"], result["features"]
+        
+        # 3. Calculate Credibility Score
+        prediction_details = _prediction_details(inference, features)
+        credibility_score = _credibility_score(inference, features)
+        
+        if request.async_explanation:
+            analysis_id, created_at = await _save_analysis(
+                session, request.news_text, text_hash, inference, features,
+                credibility_score, None, None, None, on_persisted=explanation_jobs.enqueue
+            )
+            return AnalysisResultResponse(
+                analysis_id=analysis_id,
+                is_fake=inference.is_fake,
+                credibility_score=credibility_score,
+                explanation=None,
+                explanation_status="pending",
+                prediction_details=prediction_details,
+                explanation_data=None,
+                created_at=created_at
+            )
+        
+        # 4. LLM Explanation from the pipeline (content-addressed cache first, then async pooled call)
+        explanation_text, p_tokens, c_tokens, stored_cache_key = result["explanation"]
+        
+        # 5. Save to Database
+        analysis_id, created_at = await _save_analysis(
+            session, request.news_text, text_hash, inference, features,
+            credibility_score, explanation_text, p_tokens, c_tokens, stored_cache_key
+        )
     
-    # 7. Construct Response
+    # 6. Construct Response
     return AnalysisResultResponse(
-        analysis_id=analysis.id,
-        is_fake=is_fake,
+        analysis_id=analysis_id,
+        is_fake=inference.is_fake,
         credibility_score=credibility_score,
         explanation=explanation_text,
-        prediction_details={
-            "model_confidence": model_confidence,
-            "logits_fake": outputs.logits[0][0].item(),
-            "logits_real": outputs.logits[0][1].item(),
-            "sentiment": sentiment,
-            "is_clickbait": is_clickbait,
-            "clickbait_keywords": clickbait_keywords,
-            "entity_person_count": entity_counts.get("PER", 0),
-            "entity_org_count": entity_counts.get("ORG", 0),
-            "entity_loc_count": entity_counts.get("LOC", 0),
-            "word_count": features["total_words"]
-        },
+        prediction_details=prediction_details,
         explanation_data={
             "llm_model": llm_service.model,
             "llm_provider": "openrouter",
@@ -217,14 +633,289 @@ async def analyze_news(request: AnalyzeRequest, session = Depends(get_db)):
             "prompt_tokens": p_tokens,
             "completion_tokens": c_tokens
         },
-        created_at=analysis.created_at
+        created_at=created_at
     )
 
+@app.post("/analyze/batch", response_model=BatchAnalyzeResponse)
+async def analyze_news_batch(request: BatchAnalyzeRequest, session = Depends(db_session)):
+    """
+    Bulk variant of /analyze for feed ingestion.
+    
+    All items go through one batched, length-bucketed classifier pass and one
+    spaCy `nlp.pipe` run; explanations are generated concurrently (bounded by
+    BATCH_LLM_CONCURRENCY) and all rows are inserted in a single transaction.
+    Items follow the same `force_recompute` / `async_explanation` semantics as
+    /analyze, and repeated texts within a batch are analyzed once. Each item gets
+    either a result or an error, in request order.
+    """
+    items = request.items
+    hashes = [content_hash(item.news_text) for item in items]
+    results = [None] * len(items)
+    
+    # Stored analyses of the same texts, in one query
+    lookup = [text_hash for item, text_hash in zip(items, hashes) if not item.force_recompute]
+    stored = await _db("get_analyses_by_content_hashes", lookup, session=session) if lookup else {}
+    
+    to_compute = []   # indexes analyzed in this request
+    duplicates = []   # indexes answered from a stored analysis
+    repeats = []      # (index, index of the first occurrence of the same text)
+    first_seen = {}
+    for index, (item, text_hash) in enumerate(zip(items, hashes)):
+        if not item.force_recompute and text_hash in stored:
+            if text_hash in first_seen:
+                repeats.append((index, first_seen[text_hash]))
+            else:
+                first_seen[text_hash] = index
+                duplicates.append(index)
+        elif not item.force_recompute and text_hash in first_seen:
+            repeats.append((index, first_seen[text_hash]))
+        else:
+            first_seen.setdefault(text_hash, index)
+            to_compute.append(index)
+    
+    llm_slots = asyncio.Semaphore(max(1, BATCH_LLM_CONCURRENCY))
+    
+    async def serve_duplicate(index):
+        async with llm_slots:
+            return await _serve_duplicate(stored[hashes[index]], items[index].async_explanation)
+    
+    served = await asyncio.gather(*(serve_duplicate(i) for i in duplicates), return_exceptions=True)
+    for index, outcome in zip(duplicates, served):
+        if isinstance(outcome, Exception):
+            results[index] = BatchItemResult(index=index, error=f"Explanation failed: {outcome}")
+        else:
+            results[index] = BatchItemResult(index=index, result=outcome)
+    
+    if to_compute:
+        engine = _inference_engine()
+        
+        with analyze_admission:
+            texts = [items[i].news_text for i in to_compute]
+            inferences = await engine.infer_many(texts)
+            features_list = await pools.features.run(
+                extract_features_batch, texts, inferences, ner_batch_size=NER_BATCH_SIZE
+            )
+            
+            async def explain(index, inference, features):
+                if items[index].async_explanation:
+                    return None, None, None, None
+                async with llm_slots:
+                    return await explanation_cache.get_or_generate(
+                        llm_service, items[index].news_text, **_prompt_inputs(inference, features)
+                    )
+            
+            explanations = await asyncio.gather(
+                *(explain(i, inf, feat) for i, inf, feat in zip(to_compute, inferences, features_list)),
+                return_exceptions=True
+            )
+        
+        records, record_indexes = [], []
+        for index, inference, features, explanation in zip(to_compute, inferences, features_list, explanations):
+            if isinstance(explanation, Exception):
+                results[index] = BatchItemResult(index=index, error=f"Explanation failed: {explanation}")
+                continue
+            explanation_text, p_tokens, c_tokens, stored_cache_key = explanation
+            records.append(_analysis_record(
+                items[index].news_text, hashes[index], inference, features,
+                _credibility_score(inference, features), explanation_text, p_tokens, c_tokens, stored_cache_key
+            ))
+            record_indexes.append((index, inference, features))
+        
+        # Pending explanations are queued once their row exists
+        callbacks = [explanation_jobs.enqueue if record["explanation"] is None else None for record in records]
+        saved = await _save_analyses(session, records, callbacks) if records else []
+        for (index, inference, features), record, outcome in zip(record_indexes, records, saved):
+            if isinstance(outcome, Exception):
+                results[index] = BatchItemResult(index=index, error=f"Failed to save analysis: {outcome}")
+                continue
+            analysis_id, created_at = outcome
+            explanation_text = record["analysis"]["explanation"]
+            results[index] = BatchItemResult(index=index, result=AnalysisResultResponse(
+                analysis_id=analysis_id,
+                is_fake=inference.is_fake,
+                credibility_score=record["analysis"]["credibility_score"],
+                explanation=explanation_text,
+                explanation_status=record["analysis"]["explanation_status"],
+                prediction_details=record["prediction"],
+                explanation_data={
+                    "llm_model": record["explanation"]["llm_model"],
+                    "llm_provider": record["explanation"]["llm_provider"],
+                    "explanation": explanation_text,
+                    "prompt_tokens": record["explanation"]["prompt_tokens"],
+                    "completion_tokens": record["explanation"]["completion_tokens"]
+                } if record["explanation"] else None,
+                created_at=created_at
+            ))
+    
+    for index, first in repeats:
+        original = results[first]
+        if original.result is not None:
+            dedup_hits.inc()
+            results[index] = BatchItemResult(index=index, result=original.result.model_copy(update={"deduplicated": True}))
+        else:
+            results[index] = BatchItemResult(index=index, error=original.error)
+    
+    succeeded = sum(1 for item in results if item.result is not None)
+    return BatchAnalyzeResponse(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+@app.post("/analyze/stream")
+async def analyze_news_stream(request: AnalyzeRequest, session = Depends(db_session)):
+    """
+    Streaming variant of /analyze using Server-Sent Events.
+    
+    Events:
+    - `verdict`: is_fake, credibility_score and prediction_details, sent as soon as
+      the classifier and features are ready
+    - `token`: explanation fragments as the LLM generates them
+    - `done`: analysis_id, created_at and explanation_data once the final text and
+      token usage are persisted
+    """
+    
+    text_hash = content_hash(request.news_text)
+    previous = await _find_duplicate(request, text_hash, session)
+    if previous is not None:
+        stored = await _serve_duplicate(previous, request.async_explanation)
+        
+        async def replay():
+            yield _sse("verdict", {
+                "is_fake": stored.is_fake,
+                "credibility_score": stored.credibility_score,
+                "prediction_details": stored.prediction_details.model_dump()
+            })
+            if stored.explanation:
+                yield _sse("token", {"text": stored.explanation})
+            yield _sse("done", {
+                "analysis_id": stored.analysis_id,
+                "created_at": stored.created_at,
+                "explanation_status": stored.explanation_status,
+                "explanation_data": stored.explanation_data.model_dump() if stored.explanation_data else None,
+                "deduplicated": True
+            })
+        
+        return StreamingResponse(replay(), media_type="text/event-stream")
+    
+    # Inference runs before the response starts so saturation still yields a 503
+    with analyze_admission:
+        inference, features = await _run_models(request.news_text)
+    
+    prediction_details = _prediction_details(inference, features)
+    credibility_score = _credibility_score(inference, features)
+    prompt_inputs = _prompt_inputs(inference, features)
+    cache_key = explanation_cache.make_key(request.news_text, **prompt_inputs)
+    cached = await explanation_cache.get(cache_key)
+    
+    async def events():
+        yield _sse("verdict", {
+            "is_fake": inference.is_fake,
+            "credibility_score": credibility_score,
+            "prediction_details": prediction_details
+        })
+        
+        stored_cache_key = None
+        interrupted = False
+        if cached is not None:
+            explanation_text, p_tokens, c_tokens = cached.explanation, 0, 0
+            stored_cache_key = cache_key
+            yield _sse("token", {"text": explanation_text})
+        else:
+            parts, p_tokens, c_tokens = [], 0, 0
+            # When the LLM limit is reached, stream the local fallback explanation instead
+            use_llm = llm_admission.try_acquire()
+            try:
+                async for event in llm_service.stream_explanation(
+                    request.news_text, use_llm=use_llm, **prompt_inputs
+                ):
+                    if event["type"] == "token":
+                        parts.append(event["text"])
+                        yield _sse("token", {"text": event["text"]})
+                    elif event["type"] == "error":
+                        interrupted = True
+                        yield _sse("error", {"message": event["message"]})
+                    else:
+                        p_tokens, c_tokens = event["prompt_tokens"], event["completion_tokens"]
+            finally:
+                if use_llm:
+                    llm_admission.release()
+            explanation_text = "".join(parts).strip()
+            if (p_tokens or c_tokens) and not interrupted:
+                explanation_cache.put(cache_key, CachedExplanation(explanation_text, p_tokens, c_tokens))
+                stored_cache_key = cache_key
+        
+        if interrupted:
+            # Never store the truncated text: the row is saved pending and the
+            # explanation job queue regenerates it (poll GET /analysis/{id})
+            analysis_id, created_at = await _save_analysis(
+                None, request.news_text, text_hash, inference, features,
+                credibility_score, None, None, None, on_persisted=explanation_jobs.enqueue
+            )
+            yield _sse("done", {
+                "analysis_id": analysis_id,
+                "created_at": created_at,
+                "explanation_status": "pending",
+                "explanation_data": None,
+                "deduplicated": False
+            })
+            return
+        
+        # The request-scoped session is closed once streaming starts; use a fresh one
+        analysis_id, created_at = await _save_analysis(
+            None, request.news_text, text_hash, inference, features,
+            credibility_score, explanation_text, p_tokens, c_tokens, stored_cache_key
+        )
+        yield _sse("done", {
+            "analysis_id": analysis_id,
+            "created_at": created_at,
+            "explanation_status": "ready",
+            "explanation_data": {
+                "llm_model": llm_service.model,
+                "llm_provider": "openrouter",
+                "explanation": explanation_text,
+                "prompt_tokens": p_tokens,
+                "completion_tokens": c_tokens
+            },
+            "deduplicated": False
+        })
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/analysis/{analysis_id}", response_model=AnalysisResultResponse)
+async def get_analysis(analysis_id: int, session = Depends(db_session)):
+    """Fetch a stored analysis; poll this for async explanations until explanation_status is ready"""
+    analysis = await _db("get_analysis_by_id", analysis_id, session=session)
+    if analysis is None or analysis.prediction is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return _analysis_to_response(analysis)
+
 @app.get("/history", response_model=HistoryResponse)
-async def get_history(limit: int = 20, offset: int = 0, session = Depends(get_db)):
-    items, total = db_service.get_analyses_paginated(limit, offset, session)
+async def get_history(
+    limit: int = 20,
+    offset: int = 0,
+    cursor: str = None,
+    exact_total: bool = False,
+    session = Depends(db_session)
+):
+    """
+    Newest-first history. Follow `next_cursor` for constant-cost paging;
+    `offset` still works without a cursor but gets slower on deep pages.
+    """
+    limit = max(1, limit)
+    try:
+        items, total, next_cursor = await _db(
+            "get_analyses_paginated", limit, offset, cursor, exact_total, 100, session=session
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Convert to response format
+    # Convert to response format (news_text is a 101-char DB-side prefix)
     history_items = []
     for item in items:
         history_items.append({
@@ -237,14 +928,29 @@ async def get_history(limit: int = 20, offset: int = 0, session = Depends(get_db
         
     return {
         "total": total,
+        "total_is_exact": exact_total,
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
         "items": history_items
     }
 
 @app.get("/stats", response_model=StatsResponse)
-async def get_stats(session = Depends(get_db)):
-    return db_service.get_statistics(session)
+async def get_stats():
+    """Served from the rollup tables through a short-lived in-process snapshot"""
+    return await stats_snapshot.get()
+
+# `gunicorn -c gunicorn.conf.py` sets PRELOAD_MODEL: load the weights in the master so
+# forked workers share them copy-on-write. ONNX Runtime sessions own threads and are
+# not fork-safe, so that backend always loads per worker in the lifespan.
+if os.getenv("PRELOAD_MODEL", "false").lower() == "true" and os.getenv("INFERENCE_BACKEND", "torch") != "onnx":
+    load_models()
+    _load_ner()
+    shared_detector()
+    # Keep the collector from writing to (and un-sharing) pages of the preloaded objects
+    gc.freeze()
+else:
+    set_inference_threads()
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,69 @@
+"""
+Periodic maintenance tasks (stats reconciliation and similar housekeeping)
+"""
+import asyncio
+import logging
+import os
+import time
+
+from metrics import metrics
+
+logger = logging.getLogger("maintenance")
+
+
+class PeriodicTask:
+    """
+    Runs a blocking callable on an executor every `interval` seconds.
+
+    The first run happens right after start (unless `run_on_start` is False).
+    Failures are logged and counted; the task keeps its schedule. A non-positive
+    interval disables the task.
+    """
+
+    def __init__(self, name: str, fn, executor, interval: float, run_on_start: bool = True):
+        self.name = name
+        self.fn = fn
+        self.executor = executor
+        self.interval = interval
+        self.run_on_start = run_on_start
+        self._task = None
+
+        self._runs = metrics.counter(f"maintenance_{name}_runs_total", f"Completed {name} runs")
+        self._failures = metrics.counter(f"maintenance_{name}_failures_total", f"Failed {name} runs")
+        self._duration_ms = metrics.histogram(f"maintenance_{name}_duration_ms", f"Duration of {name} runs")
+
+    @classmethod
+    def from_env(cls, name: str, fn, executor, env_var: str, default_interval: float, **kwargs) -> "PeriodicTask":
+        return cls(name, fn, executor, interval=float(os.getenv(env_var, str(default_interval))), **kwargs)
+
+    def start(self):
+        if self._task is not None or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._loop(), name=f"maintenance-{self.name}")
+        logger.info(f"Periodic task {self.name} scheduled every {self.interval:g}s")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def run_once(self):
+        started = time.perf_counter()
+        try:
+            result = await self.executor.run(self.fn)
+            self._runs.inc()
+            return result
+        except Exception as e:
+            self._failures.inc()
+            logger.warning(f"Periodic task {self.name} failed: {e}")
+        finally:
+            self._duration_ms.observe((time.perf_counter() - started) * 1000)
+
+    async def _loop(self):
+        if not self.run_on_start:
+            await asyncio.sleep(self.interval)
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
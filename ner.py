@@ -0,0 +1,141 @@
+"""
+Named-entity counts: spaCy trimmed to its NER components, run through nlp.pipe
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger("ner")
+
+ENTITY_LABELS = ("PER", "ORG", "LOC")
+# Components the entity recognizer depends on; everything else is excluded at load
+NER_COMPONENTS = ("tok2vec", "transformer", "ner")
+
+ner_ms = metrics.histogram("ner_ms", "spaCy nlp.pipe time per call")
+ner_texts = metrics.counter("ner_texts_total", "Texts run through the NER pipeline")
+
+
+def empty_counts() -> Dict[str, int]:
+    return {label: 0 for label in ENTITY_LABELS}
+
+
+class NERCounter:
+    """
+    Counts PER / ORG / LOC entities with a spaCy pipeline loaded once per process.
+
+    Only `doc.ents` is used, so components the recognizer does not need (parser,
+    tagger, lemmatizer, sentence segmentation...) are read from the package meta
+    and passed to `spacy.load` as `exclude`: they are never constructed. Texts go
+    through `nlp.pipe` in batches of `batch_size`, across `n_process` processes
+    when a call has enough texts to keep them busy. When spaCy or the model is
+    missing, counts are all zero and a warning is logged once.
+    """
+    _nlp_instance = None
+    _loaded = False
+    _load_lock = threading.Lock()
+
+    def __init__(self, model_name: Optional[str] = None, batch_size: Optional[int] = None, n_process: Optional[int] = None):
+        self.model_name = model_name or os.getenv("NER_MODEL", "xx_ent_wiki_sm")  # Multi-language model often used for Arabic
+        self.batch_size = batch_size or int(os.getenv("NER_BATCH_SIZE", "32"))
+        self.n_process = n_process or int(os.getenv("NER_PROCESSES", "1"))
+        self.nlp = self._load(self.model_name)
+
+    @classmethod
+    def _load(cls, model_name: str):
+        if cls._loaded:
+            return cls._nlp_instance
+        with cls._load_lock:
+            if cls._loaded:
+                return cls._nlp_instance
+            try:
+                import spacy
+                nlp = spacy.load(model_name, exclude=_unused_components(model_name))
+                # Safety net for pipelines whose meta could not be read
+                nlp.select_pipes(enable=[name for name in nlp.pipe_names if name in NER_COMPONENTS])
+                logger.info(f"Loaded spaCy {model_name} with components {nlp.pipe_names}")
+                cls._nlp_instance = nlp
+            except (ImportError, Exception) as e:
+                logger.warning(f"Warning: Could not import or load spaCy. NER counting will be disabled. Error: {e}")
+                cls._nlp_instance = None
+            cls._loaded = True
+        return cls._nlp_instance
+
+    def count_entities(self, text: str) -> Dict[str, int]:
+        """
+        Count named entities (Person, Org, Loc) in the text.
+        """
+        return self.count_entities_batch([text])[0]
+
+    def count_entities_batch(self, texts: List[str], batch_size: Optional[int] = None, n_process: Optional[int] = None) -> List[Dict[str, int]]:
+        """
+        Count named entities for many texts with spaCy's nlp.pipe streaming.
+        """
+        if not self.nlp:
+            return [empty_counts() for _ in texts]
+        if not texts:
+            return []
+
+        batch_size = batch_size or self.batch_size
+        n_process = self._processes_for(len(texts), batch_size, n_process or self.n_process)
+        started = time.perf_counter()
+        counts = [self._count_doc(doc) for doc in self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)]
+        ner_ms.observe((time.perf_counter() - started) * 1000)
+        ner_texts.inc(len(texts))
+        return counts
+
+    @staticmethod
+    def _processes_for(n_texts: int, batch_size: int, n_process: int) -> int:
+        # Extra processes only pay off with at least one full batch each, and
+        # daemonic processes (multiprocessing pool workers) cannot have children
+        if n_process <= 1 or multiprocessing.current_process().daemon:
+            return 1
+        return max(1, min(n_process, n_texts // max(1, batch_size)))
+
+    @staticmethod
+    def _count_doc(doc) -> Dict[str, int]:
+        counts = empty_counts()
+        # xx_ent_wiki_sm labels: PER, ORG, LOC, MISC
+        for ent in doc.ents:
+            if ent.label_ in counts:
+                counts[ent.label_] += 1
+        return counts
+
+
+def _unused_components(model_name: str) -> List[str]:
+    """
+    Components of the installed pipeline (package name or path) outside NER_COMPONENTS,
+    from its meta.json. Empty when the meta cannot be read.
+    """
+    try:
+        from spacy import util
+        path = util.get_package_path(model_name) if util.is_package(model_name) else Path(model_name)
+        meta = util.load_meta(path / "meta.json")
+    except Exception as e:
+        logger.warning(f"Could not read the components of {model_name}, loading all of them: {e}")
+        return []
+    components = meta.get("components") or meta.get("pipeline") or []
+    return [name for name in components if name not in NER_COMPONENTS]
+
+_shared_counter: Optional[NERCounter] = None
+_shared_lock = threading.Lock()
+
+
+def shared_counter() -> NERCounter:
+    """Process-wide counter configured from the environment"""
+    global _shared_counter
+    if _shared_counter is None:
+        with _shared_lock:
+            if _shared_counter is None:
+                _shared_counter = NERCounter()
+    return _shared_counter
+
+
+def count_entities_batch(texts: List[str], batch_size: Optional[int] = None, n_process: Optional[int] = None) -> List[Dict[str, int]]:
+    """Standalone batched NER for the bulk paths (batch endpoint, offline scoring)"""
+    return shared_counter().count_entities_batch(texts, batch_size=batch_size, n_process=n_process)
@@ -0,0 +1,424 @@
+"""
+Retention for the analyses table: batched TTL purge, archiving of purged rows and PostgreSQL partitioning
+
+Usage:
+    python retention.py purge --days 90 --archive-dir ./archive
+    python retention.py purge --days 90 --dry-run
+    python retention.py partition-sql > migrate.sql       # one-off: partition analyses by month
+    python retention.py ensure-partitions --months-ahead 3
+
+Rows older than the TTL are archived (optionally) and deleted together with their
+prediction and explanation rows, `batch_size` analyses per transaction, so locks
+stay short and the table never needs a full scan. daily_stats keeps the all-time
+counters; hourly_stats is trimmed to what the 24h window needs.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import joinedload
+
+from database_models import Analysis, Prediction, ExplanationData, HourlyStats
+from metrics import metrics
+
+logger = logging.getLogger("retention")
+
+purged_total = metrics.counter("retention_purged_total", "Analyses deleted by the retention purge")
+archived_total = metrics.counter("retention_archived_total", "Analyses written to retention archives")
+partitions_dropped_total = metrics.counter("retention_partitions_dropped_total", "Expired analyses partitions dropped")
+
+ARCHIVE_FORMATS = ("jsonl", "parquet")
+PARTITION_PREFIX = "analyses_p"
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class RetentionManager:
+    """
+    Keeps `analyses` bounded to the last `retention_days` days.
+
+    A non-positive `retention_days` disables purging. With `archive_dir` set, each
+    batch is written to `<archive_dir>/analyses_<first id>-<last id>.jsonl.gz`
+    (or `.parquet` when pyarrow is installed and `archive_format="parquet"`)
+    before it is deleted; the file is complete before the delete commits.
+
+    On PostgreSQL, if `analyses` has been migrated to a monthly range-partitioned
+    table (see partition_migration_sql), upcoming partitions are created ahead of
+    time and partitions emptied by the purge are dropped, returning their space
+    immediately instead of leaving it to VACUUM.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        retention_days: int = 0,
+        batch_size: int = 1000,
+        archive_dir: str = "",
+        archive_format: str = "jsonl",
+        hourly_retention_days: int = 7,
+        partition_months_ahead: int = 3
+    ):
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"archive_format must be one of {ARCHIVE_FORMATS}")
+        if archive_format == "parquet" and not _parquet_available():
+            logger.warning("Parquet archives requested but the 'pyarrow' package is not installed; writing JSONL")
+            archive_format = "jsonl"
+
+        self.db_service = db_service
+        self.retention_days = retention_days
+        self.batch_size = max(1, batch_size)
+        self.archive_dir = archive_dir
+        self.archive_format = archive_format
+        self.hourly_retention_days = max(2, hourly_retention_days)
+        self.partition_months_ahead = partition_months_ahead
+
+    @classmethod
+    def from_env(cls, db_service) -> "RetentionManager":
+        retention_days = int(os.getenv("ANALYSIS_RETENTION_DAYS", "0"))
+        # Stats reconciliation recounts recent days from `analyses`; never purge inside that window
+        min_days = int(os.getenv("STATS_RECONCILE_DAYS", "2")) + 1
+        if 0 < retention_days < min_days:
+            logger.warning(f"ANALYSIS_RETENTION_DAYS={retention_days} is inside the stats reconcile window; using {min_days}")
+            retention_days = min_days
+        return cls(
+            db_service,
+            retention_days=retention_days,
+            batch_size=int(os.getenv("RETENTION_BATCH_SIZE", "1000")),
+            archive_dir=os.getenv("RETENTION_ARCHIVE_DIR", ""),
+            archive_format=os.getenv("RETENTION_ARCHIVE_FORMAT", "jsonl"),
+            hourly_retention_days=int(os.getenv("HOURLY_STATS_RETENTION_DAYS", "7")),
+            partition_months_ahead=int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.retention_days > 0
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        return (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+
+    def run(self) -> int:
+        """One maintenance pass: partitions ahead, purge, expired partitions, hourly rollups"""
+        partitioned = self.is_partitioned()
+        if partitioned:
+            self.ensure_partitions()
+        if not self.enabled:
+            return 0
+        purged = self.purge()
+        if partitioned:
+            self.drop_expired_partitions()
+        self.purge_hourly_stats()
+        return purged
+
+    def purge(self, now: Optional[datetime] = None, dry_run: bool = False) -> int:
+        """Delete (and archive) analyses older than the TTL in batches; returns the number purged"""
+        if not self.enabled:
+            return 0
+        cutoff = self.cutoff(now)
+        if dry_run:
+            session = self.db_service.get_session()
+            try:
+                return session.execute(select(func.count(Analysis.id)).where(Analysis.created_at < cutoff)).scalar() or 0
+            finally:
+                session.close()
+
+        purged = 0
+        while True:
+            count = self._purge_batch(cutoff)
+            purged += count
+            if count < self.batch_size:
+                break
+        if purged:
+            logger.info(f"Retention purged {purged} analyses older than {cutoff:%Y-%m-%d %H:%M}")
+        return purged
+
+    def _purge_batch(self, cutoff: datetime) -> int:
+        session = self.db_service.get_session()
+        try:
+            # Oldest first along ix_analyses_created_at_id
+            ids = session.execute(
+                select(Analysis.id)
+                .where(Analysis.created_at < cutoff)
+                .order_by(Analysis.created_at, Analysis.id)
+                .limit(self.batch_size)
+            ).scalars().all()
+            if not ids:
+                return 0
+
+            if self.archive_dir:
+                self._archive(session, ids)
+
+            # Children first: partitioned tables cannot carry the foreign keys
+            session.execute(delete(ExplanationData).where(ExplanationData.analysis_id.in_(ids)))
+            session.execute(delete(Prediction).where(Prediction.analysis_id.in_(ids)))
+            session.execute(delete(Analysis).where(Analysis.id.in_(ids)))
+            session.commit()
+            purged_total.inc(len(ids))
+            return len(ids)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Retention purge batch failed: {str(e)}")
+            raise
+        finally:
+            session.close()
+
+    def purge_hourly_stats(self, now: Optional[datetime] = None) -> int:
+        """hourly_stats only backs the sliding 24h window; drop buckets past a few days"""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.hourly_retention_days)
+        session = self.db_service.get_session()
+        try:
+            deleted = session.execute(delete(HourlyStats).where(HourlyStats.hour < cutoff)).rowcount
+            session.commit()
+            return deleted or 0
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to purge hourly stats: {str(e)}")
+            raise
+        finally:
+            session.close()
+
+    # Archives
+
+    def _archive(self, session, ids: List[int]):
+        analyses = session.execute(
+            select(Analysis)
+            .options(joinedload(Analysis.prediction), joinedload(Analysis.explanation_data))
+            .where(Analysis.id.in_(ids))
+            .order_by(Analysis.id)
+        ).scalars().all()
+        rows = [archive_row(analysis) for analysis in analyses]
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        extension = "parquet" if self.archive_format == "parquet" else "jsonl.gz"
+        path = os.path.join(self.archive_dir, f"analyses_{min(ids):010d}-{max(ids):010d}.{extension}")
+        partial_path = f"{path}.partial"
+        if self.archive_format == "parquet":
+            _write_parquet(partial_path, rows)
+        else:
+            _write_jsonl_gz(partial_path, rows)
+        # A crash before the delete commits leaves a complete file that the retry overwrites
+        os.replace(partial_path, path)
+        archived_total.inc(len(rows))
+
+    # PostgreSQL partitions
+
+    def is_partitioned(self) -> bool:
+        """True when `analyses` is a partitioned table (PostgreSQL only)"""
+        if self.db_service.engine.dialect.name != "postgresql":
+            return False
+        with self.db_service.engine.connect() as conn:
+            return conn.execute(text(
+                "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = 'analyses' AND c.relnamespace = to_regnamespace(current_schema())"
+            )).first() is not None
+
+    def ensure_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """Create monthly partitions for the current month and `partition_months_ahead` after it"""
+        start = _month_start(now or datetime.utcnow())
+        statements = [
+            monthly_partition_sql(month)
+            for month in _months(start, self.partition_months_ahead + 1)
+        ]
+        with self.db_service.engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+        return statements
+
+    def drop_expired_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """Drop monthly partitions that end before the TTL cutoff and were emptied by the purge"""
+        cutoff = self.cutoff(now)
+        dropped = []
+        with self.db_service.engine.begin() as conn:
+            names = conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = 'analyses'"
+            )).scalars().all()
+            for name in names:
+                month = _partition_month(name)
+                if month is None or _add_months(month, 1) > cutoff:
+                    continue
+                if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first() is not None:
+                    continue
+                conn.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        if dropped:
+            partitions_dropped_total.inc(len(dropped))
+            logger.info(f"Dropped expired partitions: {', '.join(dropped)}")
+        return dropped
+
+
+def archive_row(analysis: Analysis) -> dict:
+    """Flat record of an analysis and its child rows (one column per field, for columnar formats)"""
+    row = {column.name: getattr(analysis, column.name) for column in Analysis.__table__.columns}
+    for prefix, child, model in (
+        ("prediction", analysis.prediction, Prediction),
+        ("explanation", analysis.explanation_data, ExplanationData)
+    ):
+        for column in model.__table__.columns:
+            if column.name in ("id", "analysis_id"):
+                continue
+            row[f"{prefix}_{column.name}"] = getattr(child, column.name) if child is not None else None
+    for name, value in row.items():
+        if isinstance(value, datetime):
+            row[name] = value.isoformat()
+    return row
+
+
+def _write_jsonl_gz(path: str, rows: List[dict]):
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for row in rows:
+                f.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _write_parquet(path: str, rows: List[dict]):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_table(pa.Table.from_pylist(rows), path, compression="zstd")
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _months(start: datetime, count: int) -> List[datetime]:
+    return [_add_months(start, i) for i in range(count)]
+
+
+def _partition_month(name: str) -> Optional[datetime]:
+    """analyses_p202601 -> 2026-01-01; None for the default or foreign partitions"""
+    suffix = name[len(PARTITION_PREFIX):] if name.startswith(PARTITION_PREFIX) else ""
+    if len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return datetime(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+def monthly_partition_sql(month: datetime) -> str:
+    upper = _add_months(month, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {PARTITION_PREFIX}{month:%Y%m} PARTITION OF analyses "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+    )
+
+
+def partition_migration_sql(first_month: datetime, months_ahead: int = 3) -> List[str]:
+    """
+    One-off PostgreSQL migration turning `analyses` into a table range-partitioned
+    by month on created_at. Partitioned tables need the partition key in every
+    unique constraint, so the primary key becomes (id, created_at) and the foreign
+    keys from predictions/explanation_data are dropped (the purge deletes children
+    explicitly). Run it in a maintenance window; it copies the table.
+    """
+    start = _month_start(first_month)
+    count = (_month_start(datetime.utcnow()).year - start.year) * 12 \
+        + _month_start(datetime.utcnow()).month - start.month + months_ahead + 1
+    return [
+        "BEGIN",
+        "ALTER TABLE predictions DROP CONSTRAINT IF EXISTS predictions_analysis_id_fkey",
+        "ALTER TABLE explanation_data DROP CONSTRAINT IF EXISTS explanation_data_analysis_id_fkey",
+        "ALTER TABLE analyses RENAME TO analyses_unpartitioned",
+        "UPDATE analyses_unpartitioned SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL",
+        "CREATE TABLE analyses (LIKE analyses_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)",
+        "ALTER TABLE analyses ADD PRIMARY KEY (id, created_at)",
+        "CREATE INDEX ix_analyses_id ON analyses (id)",
+        "CREATE INDEX ix_analyses_content_hash ON analyses (content_hash)",
+        "CREATE INDEX ix_analyses_explanation_status ON analyses (explanation_status)",
+        "CREATE INDEX ix_analyses_created_at_id ON analyses (created_at, id)",
+        "CREATE TABLE analyses_default PARTITION OF analyses DEFAULT",
+        *(monthly_partition_sql(month) for month in _months(start, max(1, count))),
+        "INSERT INTO analyses SELECT * FROM analyses_unpartitioned",
+        "ALTER SEQUENCE analyses_id_seq OWNED BY analyses.id",
+        "DROP TABLE analyses_unpartitioned",
+        "COMMIT"
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Retention maintenance for the analyses table")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    purge = commands.add_parser("purge", help="Archive and delete analyses older than the TTL")
+    purge.add_argument("--days", type=int, default=None, help="TTL in days (default: ANALYSIS_RETENTION_DAYS)")
+    purge.add_argument("--archive-dir", default=None, help="Write purged rows here (default: RETENTION_ARCHIVE_DIR)")
+    purge.add_argument("--format", choices=ARCHIVE_FORMATS, default=None, help="Archive format (default: RETENTION_ARCHIVE_FORMAT)")
+    purge.add_argument("--batch-size", type=int, default=None, help="Analyses per delete transaction")
+    purge.add_argument("--dry-run", action="store_true", help="Only count the rows that would be purged")
+
+    migrate = commands.add_parser("partition-sql", help="Print the SQL partitioning analyses by month (PostgreSQL)")
+    migrate.add_argument("--from-month", default=None, help="First partition as YYYY-MM (default: oldest row)")
+    migrate.add_argument("--months-ahead", type=int, default=3, help="Partitions created past the current month")
+
+    ensure = commands.add_parser("ensure-partitions", help="Create upcoming monthly partitions (PostgreSQL)")
+    ensure.add_argument("--months-ahead", type=int, default=None, help="Partitions past the current month")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+
+    from db_service import DatabaseService
+
+    db_service = DatabaseService()
+    manager = RetentionManager.from_env(db_service)
+
+    if args.command == "purge":
+        manager = RetentionManager(
+            db_service,
+            retention_days=args.days if args.days is not None else manager.retention_days,
+            batch_size=args.batch_size or manager.batch_size,
+            archive_dir=args.archive_dir if args.archive_dir is not None else manager.archive_dir,
+            archive_format=args.format or manager.archive_format,
+            hourly_retention_days=manager.hourly_retention_days
+        )
+        if not manager.enabled:
+            sys.exit("Retention is disabled: pass --days or set ANALYSIS_RETENTION_DAYS")
+        count = manager.purge(dry_run=args.dry_run)
+        print(f"{'Would purge' if args.dry_run else 'Purged'} {count} analyses older than {manager.cutoff():%Y-%m-%d %H:%M}")
+        return
+
+    if db_service.engine.dialect.name != "postgresql":
+        sys.exit("Partitioning is only supported on PostgreSQL")
+
+    if args.command == "partition-sql":
+        if args.from_month:
+            first_month = datetime.strptime(args.from_month, "%Y-%m")
+        else:
+            with db_service.engine.connect() as conn:
+                oldest = conn.execute(select(func.min(Analysis.created_at))).scalar()
+            first_month = oldest or datetime.utcnow()
+        for statement in partition_migration_sql(first_month, args.months_ahead):
+            print(f"{statement};")
+        return
+
+    if args.months_ahead is not None:
+        manager.partition_months_ahead = args.months_ahead
+    if not manager.is_partitioned():
+        sys.exit("analyses is not partitioned; apply the output of `partition-sql` first")
+    for statement in manager.ensure_partitions():
+        print(f"{statement};")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Startup pipeline: load and warm up the models off the event loop, report readiness
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger("startup")
+
+startup_ready = metrics.gauge("startup_ready", "1 once models are loaded and warmed up")
+startup_total_ms = metrics.gauge("startup_total_ms", "Time from application import to readiness")
+
+
+class StartupPipeline:
+    """
+    Runs startup work in stages; the callables of one stage run in parallel threads
+    (e.g. model load alongside spaCy load), and stages run in order (warm-up needs
+    the models). `on_ready` then runs on the event loop and the pipeline reports
+    ready. The API keeps serving /health meanwhile and gates traffic on /ready.
+
+    A failing step is logged and leaves the pipeline not ready (degraded), as a
+    failed model load did before.
+    """
+
+    def __init__(
+        self,
+        stages: List[Dict[str, Callable[[], object]]],
+        on_ready: Optional[Callable[[], Awaitable[None]]] = None,
+        started_at: Optional[float] = None,
+        imports_ms: Optional[float] = None
+    ):
+        """
+        `started_at` is the perf_counter() value at application import, so the
+        logged total covers imports too; `imports_ms` is reported as its own phase.
+        """
+        self.stages = stages
+        self.on_ready = on_ready
+        self.started_at = started_at
+
+        self.ready = False
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        if imports_ms is not None:
+            self.timings["imports"] = round(imports_ms, 1)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="startup-pipeline")
+
+    async def wait(self):
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def run(self):
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        width = max(len(stage) for stage in self.stages) if self.stages else 1
+        executor = ThreadPoolExecutor(max_workers=width, thread_name_prefix="startup")
+        try:
+            for stage in self.stages:
+                await asyncio.gather(*(
+                    loop.run_in_executor(executor, self._timed, name, fn) for name, fn in stage.items()
+                ))
+            if self.on_ready is not None:
+                phase_started = time.perf_counter()
+                await self.on_ready()
+                self.timings["on_ready"] = _ms_since(phase_started)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.error(f"Startup failed, serving degraded: {self.error}")
+            return
+        finally:
+            executor.shutdown(wait=False)
+
+        self.timings["pipeline"] = _ms_since(started)
+        if self.started_at is not None:
+            self.timings["total"] = _ms_since(self.started_at)
+            startup_total_ms.set(self.timings["total"])
+        self.ready = True
+        startup_ready.set(1)
+        breakdown = ", ".join(f"{name}={ms / 1000:.2f}s" for name, ms in self.timings.items())
+        logger.info(f"Startup complete: {breakdown}")
+
+    def _timed(self, name: str, fn: Callable[[], object]):
+        phase_started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.timings[name] = _ms_since(phase_started)
+            logger.info(f"Startup phase {name} took {self.timings[name] / 1000:.2f}s")
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "error": self.error, "phases_ms": dict(self.timings)}
+
+
+def _ms_since(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
@@ -0,0 +1,69 @@
+"""
+In-process snapshot of /stats, refreshed on write or after a short TTL
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from metrics import metrics
+
+logger = logging.getLogger("stats_snapshot")
+
+snapshot_hits = metrics.counter("stats_snapshot_hits_total", "/stats answered from the in-process snapshot")
+snapshot_refreshes = metrics.counter("stats_snapshot_refreshes_total", "Snapshot rebuilds from the rollup tables")
+
+
+class StatsSnapshot:
+    """
+    Caches DatabaseService.get_statistics (itself computed from rollups).
+
+    Writes call `invalidate()`, so the next read rebuilds the snapshot; otherwise
+    it is rebuilt once `ttl_seconds` have passed (the 24h window moves with time).
+    Concurrent readers share a single rebuild. Dashboard polling therefore costs
+    at most one small rollup query per TTL/write, independent of table size.
+    """
+
+    def __init__(self, db_service, db_executor, ttl_seconds: float = 5.0):
+        self.db_service = db_service
+        self.db_executor = db_executor
+        self.ttl_seconds = ttl_seconds
+
+        self._value: Optional[dict] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def from_env(cls, db_service, db_executor) -> "StatsSnapshot":
+        return cls(db_service, db_executor, ttl_seconds=float(os.getenv("STATS_SNAPSHOT_TTL", "5")))
+
+    def invalidate(self):
+        """Mark the snapshot stale; safe to call from any thread"""
+        self._generation += 1
+        self._expires_at = 0.0
+
+    async def get(self) -> dict:
+        if self._fresh():
+            snapshot_hits.inc()
+            return self._value
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have rebuilt it while we waited
+            if self._fresh():
+                snapshot_hits.inc()
+                return self._value
+            generation = self._generation
+            expires_at = time.monotonic() + self.ttl_seconds
+            self._value = await self.db_executor.run(self.db_service.get_statistics)
+            # A write during the rebuild may be missing from it; leave it stale
+            if generation == self._generation:
+                self._expires_at = expires_at
+            snapshot_refreshes.inc()
+            return self._value
+
+    def _fresh(self) -> bool:
+        return self._value is not None and time.monotonic() < self._expires_at
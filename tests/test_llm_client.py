@@ -0,0 +1,149 @@
+"""
+OpenRouterClient against a local stub server (httpx.MockTransport)
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from llm_client import LLMClientError, OpenRouterClient
+
+COMPLETION = {
+    "choices": [{"message": {"content": "explanation"}}],
+    "usage": {"prompt_tokens": 12, "completion_tokens": 34}
+}
+
+
+class StubServer:
+    """Answers each request with the next scripted response and records when it arrived"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.times = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.times.append(time.monotonic())
+        return self.responses.pop(0)
+
+
+def make_client(server, **kwargs) -> OpenRouterClient:
+    options = dict(
+        api_key="test-key",
+        api_base="http://stub.local/api/v1",
+        total_timeout=5.0,
+        max_retries=2,
+        backoff_base=0.01,
+        backoff_max=0.05,
+        http2=False,
+        transport=httpx.MockTransport(server)
+    )
+    options.update(kwargs)
+    return OpenRouterClient(**options)
+
+
+def chat(client, payload=None):
+    async def run():
+        try:
+            return await client.chat_completion(payload or {"messages": []})
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def stream(client, payload=None):
+    async def run():
+        try:
+            return [chunk async for chunk in client.stream_chat_completion(payload or {"messages": []})]
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def sse(*chunks) -> bytes:
+    lines = [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks]
+    return ("".join(lines) + ": keep-alive\n\ndata: [DONE]\n\n").encode("utf-8")
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_retryable_status(status):
+    server = StubServer([httpx.Response(status), httpx.Response(200, json=COMPLETION)])
+
+    assert chat(make_client(server)) == COMPLETION
+    assert len(server.requests) == 2
+    assert server.requests[0].headers["Authorization"] == "Bearer test-key"
+    assert server.requests[0].url.path == "/api/v1/chat/completions"
+
+
+def test_gives_up_after_max_retries():
+    server = StubServer([httpx.Response(503)] * 3)
+
+    with pytest.raises(LLMClientError, match="after 3 attempts"):
+        chat(make_client(server))
+    assert len(server.requests) == 3
+
+
+def test_non_retryable_status_fails_immediately():
+    server = StubServer([httpx.Response(401, text="bad key")])
+
+    with pytest.raises(LLMClientError) as error:
+        chat(make_client(server))
+    assert error.value.status_code == 401
+    assert len(server.requests) == 1
+
+
+def test_honors_retry_after_longer_than_backoff_max():
+    server = StubServer([
+        httpx.Response(429, headers={"Retry-After": "0.3"}),
+        httpx.Response(200, json=COMPLETION)
+    ])
+
+    assert chat(make_client(server, backoff_max=0.05)) == COMPLETION
+    assert server.times[1] - server.times[0] >= 0.3
+
+
+def test_fails_fast_when_retry_after_exceeds_deadline():
+    server = StubServer([httpx.Response(429, headers={"Retry-After": "30"})])
+    started = time.monotonic()
+
+    with pytest.raises(LLMClientError, match="Retry-After 30s exceeds the total timeout"):
+        chat(make_client(server, total_timeout=2.0))
+    assert time.monotonic() - started < 1.0
+    assert len(server.requests) == 1
+
+
+def test_stream_yields_chunks():
+    chunks = [
+        {"choices": [{"delta": {"content": "Hel"}}]},
+        {"choices": [{"delta": {"content": "lo"}}]},
+        {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 2}}
+    ]
+    server = StubServer([httpx.Response(200, content=sse(*chunks))])
+
+    assert stream(make_client(server)) == chunks
+    body = json.loads(server.requests[0].content)
+    assert body["stream"] is True
+    assert body["stream_options"] == {"include_usage": True}
+
+
+def test_stream_retries_before_first_chunk():
+    chunk = {"choices": [{"delta": {"content": "ok"}}]}
+    server = StubServer([
+        httpx.Response(503, headers={"Retry-After": "0.1"}),
+        httpx.Response(200, content=sse(chunk))
+    ])
+
+    assert stream(make_client(server)) == [chunk]
+    assert len(server.requests) == 2
+    assert server.times[1] - server.times[0] >= 0.1
+
+
+def test_stream_fails_fast_when_retry_after_exceeds_deadline():
+    server = StubServer([httpx.Response(503, headers={"Retry-After": "30"})])
+
+    with pytest.raises(LLMClientError, match="exceeds the total timeout"):
+        stream(make_client(server, total_timeout=2.0))
+    assert len(server.requests) == 1
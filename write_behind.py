@@ -0,0 +1,315 @@
+"""
+Write-behind persistence: buffer completed analyses in memory and bulk-insert them in the background
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from execution import ExecutorSaturated
+from metrics import metrics
+
+logger = logging.getLogger("write_behind")
+
+queue_depth = metrics.gauge("write_behind_queue_depth", "Analyses waiting to be flushed")
+flushed_total = metrics.counter("write_behind_flushed_total", "Analyses inserted by the flusher")
+flush_batch_size = metrics.histogram("write_behind_flush_batch_size", "Analyses per bulk insert")
+flush_latency_ms = metrics.histogram("write_behind_flush_latency_ms", "Bulk insert latency")
+spilled_total = metrics.counter("write_behind_spilled_total", "Analyses written to the spill file after a failed flush")
+spill_quarantined_total = metrics.counter("write_behind_spill_quarantined_total", "Spilled lines moved to the .bad file because they could not be decoded")
+ids_reserved = metrics.gauge("write_behind_ids_reserved", "Preallocated analysis ids left in the reserve")
+rejected_total = metrics.counter("write_behind_rejected_total", "Analyses persisted synchronously because the buffer was full")
+
+
+class WriteBehindBuffer:
+    """
+    Decouples /analyze latency from INSERTs.
+
+    Records (see main._analysis_record) get their id and created_at up front, so the
+    response is built before anything is written. Ids come from a reserve of
+    `id_reserve` ids allocated with DatabaseService.allocate_analysis_ids and topped
+    up in the background when half of it is used, so a database outage is absorbed
+    (by the spill file below) for as many analyses as the reserve holds; only once
+    it is exhausted are requests rejected with 503.
+
+    A background flusher bulk-inserts queued records once `batch_size` are waiting
+    or `flush_interval` seconds have passed. If a flush fails the batch is appended
+    to a JSONL spill file, which is replayed on start and after the next successful
+    flush; inserts skip ids that already exist, so replays are idempotent, and lines
+    that cannot be decoded are set aside in `<spill_path>.bad`. `stop()`
+    signals the flusher, which writes out the batch it is collecting and everything
+    still queued before exiting.
+
+    Until a record is flushed it is invisible to reads (history, dedup, GET
+    /analysis/{id}); `on_persisted` callbacks run once it is stored.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        db_executor,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        id_block_size: int = 1000,
+        id_reserve: int = 5000,
+        spill_path: str = "./write_behind_spill.jsonl"
+    ):
+        self.db_service = db_service
+        self.db_executor = db_executor
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.id_block_size = max(1, id_block_size)
+        self.id_reserve = max(self.id_block_size, id_reserve)
+        self.spill_path = spill_path
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task = None
+        self._stopping = False
+        self._added: Optional[asyncio.Event] = None
+        self._ids: List[int] = []
+        self._id_lock: Optional[asyncio.Lock] = None
+        self._refill_task = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def from_env(cls, db_service, db_executor) -> Optional["WriteBehindBuffer"]:
+        """None unless WRITE_BEHIND is enabled"""
+        if os.getenv("WRITE_BEHIND", "false").lower() != "true":
+            return None
+        return cls(
+            db_service,
+            db_executor,
+            max_queue=int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000")),
+            batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200")),
+            flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5")),
+            id_block_size=int(os.getenv("WRITE_BEHIND_ID_BLOCK", "1000")),
+            id_reserve=int(os.getenv("WRITE_BEHIND_ID_RESERVE", "5000")),
+            spill_path=os.getenv("WRITE_BEHIND_SPILL_PATH", "./write_behind_spill.jsonl")
+        )
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._added = asyncio.Event()
+        self._stopping = False
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        await self._refill_ids()
+        await self._replay_spill()
+        self._task = asyncio.create_task(self._flusher(), name="write-behind-flusher")
+        logger.info(
+            f"Write-behind buffer started (batch_size={self.batch_size}, "
+            f"flush_interval={self.flush_interval}s, max_queue={self.max_queue})"
+        )
+
+    async def stop(self):
+        """Stop accepting records, let the flusher write out everything queued, then exit"""
+        if self._task is None:
+            return
+        self._stopping = True
+        if not self._task.done():
+            # The flusher is never cancelled: it may hold records taken off the queue
+            await self._queue.put(_STOP)
+        outcome, = await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if isinstance(outcome, Exception):
+            logger.error(f"Write-behind flusher failed: {outcome}")
+        # Whatever a failed flusher left behind
+        while not self._queue.empty():
+            await self._flush([entry for entry in self._take(self.batch_size) if entry is not _STOP])
+        if self._refill_task is not None:
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+        async with self._flush_lock:
+            await self._replay_spill()
+        logger.info("Write-behind buffer drained")
+
+    async def prepare(self, record: dict) -> tuple:
+        """Assign a reserved id and created_at to a record; returns (analysis_id, created_at)"""
+        analysis_id = await self._next_id()
+        created_at = datetime.utcnow()
+        record["analysis"]["id"] = analysis_id
+        record["analysis"]["created_at"] = created_at
+        return analysis_id, created_at
+
+    def submit(self, record: dict, on_persisted: Optional[Callable[[int], None]] = None) -> bool:
+        """
+        Queue a prepared record. Returns False when the buffer is full; the caller
+        should then persist it synchronously (DatabaseService.insert_analyses_bulk).
+        """
+        if self._queue is None or self._stopping:
+            return False
+        try:
+            self._queue.put_nowait((record, on_persisted))
+        except asyncio.QueueFull:
+            rejected_total.inc()
+            return False
+        queue_depth.set(self._queue.qsize())
+        self._added.set()
+        return True
+
+    async def _next_id(self) -> int:
+        if not self._ids:
+            await self._refill_ids()
+            if not self._ids:
+                raise ExecutorSaturated("write-behind id reserve", self.db_executor.retry_after)
+        analysis_id = self._ids.pop(0)
+        if len(self._ids) < self.id_reserve // 2 and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = asyncio.create_task(self._refill_ids(), name="write-behind-id-refill")
+        ids_reserved.set(len(self._ids))
+        return analysis_id
+
+    async def _refill_ids(self):
+        """Top the id reserve up in blocks of id_block_size; failures are retried on a later request"""
+        async with self._id_lock:
+            missing = self.id_reserve - len(self._ids)
+            if missing <= 0:
+                return
+            count = -(-missing // self.id_block_size) * self.id_block_size
+            try:
+                self._ids.extend(await self.db_executor.run(self.db_service.allocate_analysis_ids, count))
+            except Exception as e:
+                logger.warning(f"Could not reserve analysis ids ({len(self._ids)} left): {e}")
+            ids_reserved.set(len(self._ids))
+
+    def _take(self, limit: int) -> list:
+        entries = []
+        while len(entries) < limit and not self._queue.empty():
+            entries.append(self._queue.get_nowait())
+        queue_depth.set(self._queue.qsize())
+        return entries
+
+    async def _flusher(self):
+        stopping = False
+        while not stopping:
+            # Wait for the first record, then give the batch up to flush_interval to fill.
+            # Records only leave the queue through get/get_nowait here, never through a
+            # cancelled wait, so none can be dropped between the queue and the batch.
+            entries = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while entries[-1] is not _STOP and len(entries) < self.batch_size:
+                entries.extend(self._take(self.batch_size - len(entries)))
+                remaining = deadline - time.monotonic()
+                if entries[-1] is _STOP or len(entries) >= self.batch_size or remaining <= 0:
+                    break
+                self._added.clear()
+                if not self._queue.empty():
+                    continue
+                try:
+                    await asyncio.wait_for(self._added.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            # stop() enqueues _STOP after the last record it accepts
+            stopping = entries[-1] is _STOP
+            if stopping:
+                entries.pop()
+            await self._flush(entries)
+
+    async def _flush(self, entries: list):
+        if not entries:
+            return
+        async with self._flush_lock:
+            records = [record for record, _ in entries]
+            started = time.perf_counter()
+            try:
+                await self.db_executor.run(self.db_service.insert_analyses_bulk, records)
+            except Exception as e:
+                logger.error(f"Write-behind flush of {len(records)} analyses failed, spilling to disk: {e}")
+                self._spill(records)
+                return
+            flush_latency_ms.observe((time.perf_counter() - started) * 1000)
+            flush_batch_size.observe(len(records))
+            flushed_total.inc(len(records))
+
+        for record, on_persisted in entries:
+            if on_persisted is not None:
+                try:
+                    on_persisted(record["analysis"]["id"])
+                except Exception as e:
+                    logger.warning(f"on_persisted callback failed for analysis {record['analysis']['id']}: {e}")
+
+        if os.path.exists(self.spill_path):
+            await self._replay_spill()
+
+    def _spill(self, records: list):
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=_encode_datetime) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        spilled_total.inc(len(records))
+
+    async def _replay_spill(self):
+        if not os.path.exists(self.spill_path):
+            return
+        # Move the file aside first so records spilled during the replay are kept
+        replay_path = f"{self.spill_path}.replay"
+        if not os.path.exists(replay_path):
+            os.replace(self.spill_path, replay_path)
+
+        try:
+            records = self._read_spill(replay_path)
+        except OSError as e:
+            logger.warning(f"Could not read the spill file {replay_path}, will retry later: {e}")
+            return
+        try:
+            for i in range(0, len(records), self.batch_size):
+                await self.db_executor.run(self.db_service.insert_analyses_bulk, records[i:i + self.batch_size])
+        except Exception as e:
+            logger.warning(f"Spill replay failed, will retry later: {e}")
+            return
+        os.remove(replay_path)
+        logger.info(f"Replayed {len(records)} spilled analyses")
+
+    def _read_spill(self, path: str) -> list:
+        """
+        Decode a spill file line by line. Lines that do not decode (a write torn by a
+        crash, a malformed record) are moved to `<spill_path>.bad` so the rest replays.
+        """
+        records, bad = [], []
+        # surrogateescape keeps a torn multi-byte character as is for the quarantine file
+        with open(path, "r", encoding="utf-8", errors="surrogateescape") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(_decode_record(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    bad.append(line if line.endswith("\n") else line + "\n")
+                    logger.error(f"Undecodable spilled analysis in {path}: {e}")
+        if bad:
+            with open(f"{self.spill_path}.bad", "a", encoding="utf-8", errors="surrogateescape") as f:
+                f.writelines(bad)
+                f.flush()
+                os.fsync(f.fileno())
+            # Rewrite the replay file without them so a retry does not quarantine them twice
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, default=_encode_datetime) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            spill_quarantined_total.inc(len(bad))
+            logger.error(f"Moved {len(bad)} undecodable spilled analyses to {self.spill_path}.bad")
+        return records
+
+
+_STOP = object()
+
+
+def _encode_datetime(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _decode_record(line: str) -> dict:
+    record = json.loads(line)
+    record["analysis"]["created_at"] = datetime.fromisoformat(record["analysis"]["created_at"])
+    return record